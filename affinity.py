@@ -0,0 +1,87 @@
+import itertools
+import streamlit as st
+import pandas as pd
+import numpy as np
+from data_loader import dataset_version, DATA_PATH
+import instrumentation as instr
+from backends import get_backend
+
+RULE_COLUMNS = ['antecedents', 'consequents', 'antecedent support', 'consequent support',
+                'support', 'confidence', 'lift', 'leverage', 'conviction']
+
+# ---------------- Packed Baskets ----------------
+# Vertical layout: one packed bit row per item, one bit per basket (order). The
+# support of any itemset is the popcount of the AND of its items' rows.
+if hasattr(np, 'bitwise_count'):
+    def _popcount(bits): return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+else:
+    _POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    def _popcount(bits): return _POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+@instr.traced()
+def basket_bitsets(df, item_col='Sub-Category', basket_col='Order ID'):
+    # Returns (bits[n_items, ceil(n_baskets/8)] uint8, item labels, n_baskets)
+    baskets, _ = pd.factorize(df[basket_col])
+    item_codes, items = pd.factorize(df[item_col], sort=True)
+    n_baskets = int(baskets.max()) + 1 if len(baskets) else 0
+    bits = np.zeros((len(items), (n_baskets + 7) // 8), dtype=np.uint8)
+    np.bitwise_or.at(bits, (item_codes, baskets >> 3), (128 >> (baskets & 7)).astype(np.uint8))
+    return bits, list(items), n_baskets
+
+# ---------------- Eclat ----------------
+@instr.traced()
+def frequent_itemsets(bits, items, n_baskets, min_support=0.01, max_len=None):
+    # Depth-first Eclat over the packed tid-lists. Output matches mlxtend's apriori:
+    # a DataFrame with 'support' and 'itemsets' (frozensets of item labels).
+    found = []
+    if n_baskets == 0: return pd.DataFrame({'support': [], 'itemsets': []})
+
+    def extend(prefix, cand_ids, cand_bits, cand_counts):
+        for k, i in enumerate(cand_ids):
+            itemset = prefix + (i,)
+            found.append((itemset, cand_counts[k]))
+            if max_len and len(itemset) >= max_len: continue
+            joined = cand_bits[k + 1:] & cand_bits[k]
+            counts = _popcount(joined)
+            keep = counts / n_baskets >= min_support
+            if keep.any():
+                extend(itemset, cand_ids[k + 1:][keep], joined[keep], counts[keep])
+
+    counts = _popcount(bits)
+    keep = counts / n_baskets >= min_support
+    extend((), np.flatnonzero(keep), bits[keep], counts[keep])
+    found.sort(key=lambda f: (len(f[0]), f[0]))
+    return pd.DataFrame({'support': [c / n_baskets for _, c in found],
+                         'itemsets': [frozenset(items[i] for i in s) for s, _ in found]})
+
+@instr.traced()
+def association_rules(itemsets, metric='lift', min_threshold=1.0):
+    # Every split of each frequent itemset into antecedent -> consequent; all subsets
+    # of a frequent itemset are frequent, so their supports are already in the table.
+    support = dict(zip(itemsets['itemsets'], itemsets['support']))
+    rows = []
+    for s, s_sup in support.items():
+        for r in range(1, len(s)):
+            for a in itertools.combinations(s, r):
+                a = frozenset(a); c = s - a
+                a_sup, c_sup = support[a], support[c]
+                conf = s_sup / a_sup
+                conviction = np.inf if conf >= 1 else (1 - c_sup) / (1 - conf)
+                rows.append((a, c, a_sup, c_sup, s_sup, conf, conf / c_sup, s_sup - a_sup * c_sup, conviction))
+    rules = pd.DataFrame(rows, columns=RULE_COLUMNS)
+    return rules[rules[metric] >= min_threshold].reset_index(drop=True)
+
+# ---------------- Cached Rules ----------------
+@st.cache_data(max_entries=256)
+def _cached_rules(filters, min_support, path, version):
+    instr.cache_miss()
+    d = get_backend(path).rows(filters, path, ['Order ID', 'Sub-Category'])
+    bits, items, n_baskets = basket_bitsets(d)
+    if n_baskets == 0: return 0, pd.DataFrame(columns=RULE_COLUMNS)
+    itemsets = frequent_itemsets(bits, items, n_baskets, min_support)
+    return n_baskets, association_rules(itemsets, metric="lift", min_threshold=1)
+
+@instr.traced(cached=True)
+def load_rules(filters, min_support=0.01, path=DATA_PATH):
+    # (number of baskets, rules) for a filter state, shared across sessions
+    return _cached_rules(filters, min_support, path, dataset_version(path))
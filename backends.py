@@ -0,0 +1,161 @@
+import os
+import threading
+import importlib.util
+import numpy as np
+import pandas as pd
+import streamlit as st
+import data_loader as dl
+from data_loader import load_data, load_filter_index, dataset_version, DATE_COL
+
+# duckdb is imported by the engine itself, only when it is selected
+_HAS_DUCKDB = dl._HAS_ARROW and importlib.util.find_spec("duckdb") is not None
+
+# ---------------- Query Backends ----------------
+# Filter-keyed reads (shared aggregates, KPIs, filter choices, the pages' filtered row
+# sets, and the projected rows the dataset-level structures are built from) go
+# through a backend chosen once per process with SUPERSTORE_BACKEND:
+#   pandas (default)  the prepared in-memory frame plus its FilterIndex
+#   duckdb            an embedded DuckDB that scans the Arrow snapshot parts with
+#                     predicate and projection pushdown and multi-threaded aggregation;
+#                     the prepared frame is never loaded, only query results (a
+#                     missing snapshot is built with the chunked CSV parse first)
+# Every backend returns plain DataFrames with the same columns, so callers and the
+# st.cache_data layers in plot_functions do not care which one answered. rows() takes
+# the projection, an optional Discount > 0 predicate and a row limit, so a page only
+# reads the columns and lines it shows.
+BACKEND = os.environ.get("SUPERSTORE_BACKEND", "pandas").lower()
+# Filter key matching every row: the dataset-level structures (OLAP cube, geo store,
+# customer metrics, regression statistics) are built from rows(ALL_ROWS, path, columns)
+ALL_ROWS = ("All", "All", "All", "All")
+
+def _normalise(value, cast):
+    # "All", one value, or a sorted tuple of several (multi-select; nothing selected means all)
+    if isinstance(value, (list, tuple, set)):
+        values = sorted({cast(v) for v in value})
+        if not values: return "All"
+        return values[0] if len(values) == 1 else tuple(values)
+    return value if value == "All" else cast(value)
+
+def _dates(dates):
+    # (first day, last day) as Timestamps, or "All"; a range still being picked
+    # in st.date_input (one date so far) counts as no range
+    if dates is None or isinstance(dates, str) or len(dates) != 2: return "All"
+    start, end = sorted(pd.Timestamp(d).normalize() for d in dates)
+    return (start, end)
+
+def date_span(value):
+    # Inclusive day range -> half-open [start, end) bounds
+    return value[0], value[1] + pd.Timedelta(days=1)
+
+def selection(year, region, category, segment, dates=None):
+    # Filter state -> {column: "All", a value or a tuple of values; Order Date: "All" or (first, last day)}
+    return {'Order Year': _normalise(year, int), 'Region': _normalise(region, str),
+            'Category': _normalise(category, str), 'Segment': _normalise(segment, str),
+            DATE_COL: _dates(dates)}
+
+class PandasBackend:
+    name = "pandas"
+
+    def rows(self, filters, path, columns=None, discounted=False, limit=None):
+        df = load_data(path)
+        rows = load_filter_index(path).rows(selection(*filters))
+        if discounted:
+            disc = df['Discount'].to_numpy()
+            rows = np.flatnonzero(disc > 0) if rows is None else rows[disc[rows] > 0]
+        if limit is not None: rows = np.arange(min(limit, len(df))) if rows is None else rows[:limit]
+        if columns is not None: df = df[list(columns)]
+        return df if rows is None else df.take(rows)
+
+    def aggregate(self, filters, grain, path):
+        d = self.rows(filters, path, list(grain) + ['Sales', 'Profit', 'Discount'])
+        return d.groupby(list(grain), as_index=False, observed=True).agg(
+            **{'Sales': ('Sales', 'sum'), 'Profit': ('Profit', 'sum'),
+               'Discount Sum': ('Discount', 'sum'), 'Rows': ('Discount', 'count')})
+
+    def order_count(self, filters, path):
+        return int(self.rows(filters, path, ['Order ID'])['Order ID'].nunique())
+
+    def distinct(self, column, path):
+        return sorted(load_data(path)[column].unique())
+
+    def bounds(self, column, path):
+        s = load_data(path)[column]
+        return s.min(), s.max()
+
+def _quote(col):
+    return '"' + col.replace('"', '""') + '"'
+
+class DuckDBBackend:
+    name = "duckdb"
+
+    def __init__(self, path):
+        import duckdb
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        dl.ensure_snapshot(path)
+        snap_dir = dl.snapshot_dir(path)
+        parts = [os.path.join(snap_dir, p) for p in dl.read_meta(snap_dir)["parts"]]
+        # Parts can differ in integer widths (see data_loader.optimize_dtypes); scan with the widest
+        schema = pa.unify_schemas([ds.dataset(p, format="ipc").schema for p in parts], promote_options="permissive")
+        self.dataset = ds.dataset(parts, format="ipc", schema=schema)
+        self.con = duckdb.connect()
+        self.lock = threading.Lock()
+
+    def _query(self, sql, params):
+        # One cursor per query: cursors are independent connections to the same database,
+        # each with its own registration of the (lazily scanned) snapshot dataset
+        with self.lock: cur = self.con.cursor()
+        try: return cur.register("orders", self.dataset).execute(sql, params).df()
+        finally: cur.close()
+
+    def _where(self, filters, discounted=False):
+        clauses, params = (['"Discount" > 0'] if discounted else []), []
+        for col, value in selection(*filters).items():
+            if value == "All": continue
+            if col == DATE_COL:
+                clauses.append(f"{_quote(col)} >= ? AND {_quote(col)} < ?")
+                params += [t.to_pydatetime() for t in date_span(value)]
+            elif isinstance(value, tuple):
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(value))})")
+                params += list(value)
+            else:
+                clauses.append(f"{_quote(col)} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def rows(self, filters, path, columns=None, discounted=False, limit=None):
+        where, params = self._where(filters, discounted)
+        cols = "*" if columns is None else ", ".join(_quote(c) for c in columns)
+        if limit is not None: where, params = where + " LIMIT ?", params + [int(limit)]
+        return self._query(f"SELECT {cols} FROM orders{where}", params)
+
+    def aggregate(self, filters, grain, path):
+        where, params = self._where(filters)
+        keys = ", ".join(_quote(c) for c in grain)
+        return self._query(
+            f'SELECT {keys}, sum("Sales") AS "Sales", sum("Profit") AS "Profit", '
+            f'sum("Discount") AS "Discount Sum", count("Discount") AS "Rows" '
+            f"FROM orders{where} GROUP BY ALL ORDER BY ALL", params)
+
+    def order_count(self, filters, path):
+        where, params = self._where(filters)
+        return int(self._query(f'SELECT count(DISTINCT "Order ID") AS n FROM orders{where}', params)['n'].iloc[0])
+
+    def distinct(self, column, path):
+        c = _quote(column)
+        return self._query(f"SELECT DISTINCT {c} FROM orders WHERE {c} IS NOT NULL ORDER BY 1", [])[column].tolist()
+
+    def bounds(self, column, path):
+        c = _quote(column)
+        row = self._query(f"SELECT min({c}) AS lo, max({c}) AS hi FROM orders", [])
+        return row['lo'].iloc[0], row['hi'].iloc[0]
+
+@st.cache_resource(max_entries=2) # One engine per dataset version, shared by every session
+def _load_backend(name, path, version):
+    if name == "duckdb" and os.path.exists(path): # the mock fallback has no file to scan
+        if not _HAS_DUCKDB: raise RuntimeError("SUPERSTORE_BACKEND=duckdb requires the duckdb and pyarrow packages.")
+        return DuckDBBackend(path)
+    return PandasBackend()
+
+def get_backend(path=dl.DATA_PATH):
+    return _load_backend(BACKEND, path, dataset_version(path))
@@ -0,0 +1,178 @@
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import tempfile
+import tracemalloc
+import warnings
+import numpy as np
+import pandas as pd
+import data_loader as dl
+import plot_functions as pf
+import forecasting as fc
+from olap_cube import OlapCube
+from geo import GeoStore
+from affinity import basket_bitsets, frequent_itemsets, association_rules
+from segmentation import Segmentation
+from customer_metrics import CustomerMetrics
+import regression as rg
+import export as ex
+
+# ---------------- Benchmark Harness ----------------
+# Synthesises Superstore-shaped data (data_loader.make_mock_data) at each requested
+# size and times every stage of the pipeline plus the heavy page computations, on the
+# uncached internals so each stage does its full work. Wall time and the tracemalloc
+# peak (Python + numpy allocations) are reported per stage as JSON.
+# Usage: python benchmark.py --rows 10000 1000000 10000000 [--out results.json]
+#        python benchmark.py --imports [--import-budget 1.5]
+
+# A mid-selectivity filter state: one year, one region, one segment
+FILTER = (2016, "West", "All", "Consumer")
+
+def run_stage(results, name, fn, *args, **kwargs):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        out, error = fn(*args, **kwargs), None
+    except Exception as e:
+        out, error = None, f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.append({"stage": name, "wall_s": round(wall, 4), "peak_mb": round(peak / 2**20, 2),
+                    **({"error": error} if error else {})})
+    print(f"  {name:<28} {wall:9.3f}s {peak / 2**20:10.1f} MB" + (f"  {error}" if error else ""), file=sys.stderr)
+    return out
+
+def _regression(df):
+    from scipy import stats
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+    d = df[df['Discount'] > 0]
+    stats.linregress(d['Discount'], d['Profit'])
+    X_train, X_test, y_train, y_test = train_test_split(df[['Sales', 'Quantity', 'Discount']], df['Profit'],
+                                                        test_size=0.3, random_state=42)
+    return LinearRegression().fit(X_train, y_train).score(X_test, y_test)
+
+def _rules(df):
+    bits, items, n_baskets = basket_bitsets(df)
+    return association_rules(frequent_itemsets(bits, items, n_baskets, 0.01), metric="lift", min_threshold=1)
+
+def _figures(df):
+    for fig in (pf.fig_monthly_sales, pf.fig_yearly_overview, pf.fig_profit_by_category,
+                pf.fig_sales_by_region, pf.fig_top_customers, pf.fig_cohort_analysis,
+                pf.fig_funnel_analysis, pf.fig_discount_heatmap):
+        fig(df)
+    pf.fig_profit_vs_sales(df)
+
+# ---------------- Import Budget ----------------
+# Each app module is imported in a fresh interpreter. The check fails when an import
+# takes longer than the budget or eagerly pulls in a model library that should only
+# load on first use (statsmodels, scikit-learn, scipy, duckdb, joblib).
+APP_MODULES = ['data_loader', 'plot_functions', 'forecasting', 'olap_cube', 'geo', 'affinity',
+               'segmentation', 'regression', 'backends', 'deferred', 'grid',
+               'export', 'customer_metrics']
+LAZY_MODULES = ['statsmodels', 'sklearn', 'scipy', 'duckdb', 'joblib']
+IMPORT_BUDGET_S = 1.5
+_PROBE = ("import sys, time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t); "
+          "print(' '.join(m for m in {lazy!r} if m in sys.modules))")
+
+def import_report(budget_s=IMPORT_BUDGET_S):
+    rows = []
+    for module in APP_MODULES:
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+                             capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__))).stdout.splitlines()
+        secs, eager = float(out[0]), out[1].split() if len(out) > 1 else []
+        rows.append({"module": module, "import_s": round(secs, 3), "eager": eager,
+                     "ok": secs <= budget_s and not eager})
+        print(f"  {module:<16} {secs:7.3f}s" + (f"  eager: {', '.join(eager)}" if eager else ""), file=sys.stderr)
+    return rows
+
+def benchmark(n_rows, seed=42, csv_max_rows=1_000_000, work_dir=None):
+    results = []
+    raw = run_stage(results, "generate", dl.make_mock_data, n_rows, seed)
+    tmp = work_dir or tempfile.mkdtemp(prefix="superstore-bench-")
+    path = os.path.join(tmp, "Superstore.csv")
+    try:
+        # ---- Load ----
+        if n_rows <= csv_max_rows:
+            raw.to_csv(path, index=False, encoding="latin1")
+            run_stage(results, "csv_parse", pd.read_csv, path, encoding="latin1", dtype=dl.CSV_DTYPES)
+        else:
+            open(path, "w").close()  # snapshot metadata needs a source file
+        raw_mb = dl.frame_memory(raw) / 2**20
+        df = run_stage(results, "prepare", dl.prepare_data, raw)
+        memory = {"raw_mb": round(raw_mb, 1), "prepared_mb": round(dl.frame_memory(df) / 2**20, 1), **df.attrs.get("memory", {})}
+        print(f"  memory: raw {raw_mb:,.1f} MB, before / after dtype compaction "
+              f"{memory.get('before_dtypes_mb', 0):,.1f} / {memory.get('after_dtypes_mb', 0):,.1f} MB", file=sys.stderr)
+        del raw
+        if dl._HAS_ARROW:
+            run_stage(results, "snapshot_write", dl.write_snapshot, df, path)
+            run_stage(results, "snapshot_read", dl.read_snapshot, path)
+
+        # ---- Filter & aggregate ----
+        index = run_stage(results, "filter_index_build", dl.FilterIndex, df)
+        filtered = run_stage(results, "apply_filters_index", pf.apply_filters, df, *FILTER, index=index)
+        run_stage(results, "apply_filters_mask", pf.apply_filters, df, *FILTER)
+        run_stage(results, "compute_kpis", pf.compute_kpis, filtered)
+        run_stage(results, "figures_all_rows", _figures, df)
+        run_stage(results, "figures_filtered", _figures, filtered)
+        run_stage(results, "geo_store_build", GeoStore, df)
+
+        # ---- Heavy page computations ----
+        cube = run_stage(results, "olap_cube_build", OlapCube, df)
+        run_stage(results, "olap_cube_pivot", cube.pivot, "All", "All", "Category", "Region", "Sales", "sum")
+        run_stage(results, "olap_pivot_table", pd.pivot_table, df, index="Category", columns="Region",
+                  values="Sales", aggfunc="sum", observed=True)
+        run_stage(results, "association_rules", _rules, df)
+        customers = run_stage(results, "customer_metrics_build", CustomerMetrics, df)
+        run_stage(results, "kmeans_sweep", Segmentation, customers.table, "auto", 1)
+        series = fc.monthly_series(df)
+        if fc.can_forecast(series):
+            run_stage(results, "holt_winters_fit", fc.fit_holt_winters, series)
+        run_stage(results, "regression", _regression, df)
+        rs = run_stage(results, "regression_stats_build", rg.RegressionStats, df)
+        G, folds = rs.gram_for(FILTER[:3])
+        run_stage(results, "regression_stats_fit_cv", rg.ols_fit, G, rg.REG_FEATURES, rs.columns, folds)
+
+        # ---- Export ----
+        run_stage(results, "export_estimate", ex.estimate_sizes, filtered)
+        if 'parquet' in ex.FORMATS:
+            run_stage(results, "export_parquet", lambda: ex.build_export(df, 'parquet').close())
+    finally:
+        if work_dir is None: shutil.rmtree(tmp, ignore_errors=True)
+    return {"rows": n_rows, "memory": memory, "stages": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the Superstore pipeline on synthetic data of several sizes.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--csv-max-rows", type=int, default=1_000_000,
+                        help="Largest size for which a CSV is written and its parse timed")
+    parser.add_argument("--out", default=None, help="Write the JSON report here instead of stdout")
+    parser.add_argument("--imports", action="store_true",
+                        help="Only check module import times; exit 1 when over budget or eager")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_S)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+    report = {"python": sys.version.split()[0], "pandas": pd.__version__, "numpy": np.__version__}
+    if args.imports:
+        report["imports"] = import_report(args.import_budget)
+    else:
+        report["runs"] = []
+        for n in args.rows:
+            print(f"{n:,} rows", file=sys.stderr)
+            report["runs"].append(benchmark(n, args.seed, args.csv_max_rows))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text)
+    else:
+        print(text)
+    if args.imports and not all(r["ok"] for r in report["imports"]):
+        sys.exit(1)
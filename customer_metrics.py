@@ -0,0 +1,115 @@
+import os
+import streamlit as st
+import pandas as pd
+import numpy as np
+from data_loader import dataset_version, snapshot_dir, read_meta, DATA_PATH
+from backends import get_backend, ALL_ROWS
+import instrumentation as instr
+
+# Order-line columns the metrics are built from
+ORDER_COLS = ['Order ID', 'Customer ID', 'Customer Name', 'Segment', 'Order Date', 'Sales', 'Profit']
+# Simple CLV horizon: average profit per order x orders per year x CLV_YEARS
+CLV_YEARS = 3
+# Customers with a shorter history are rated as if they had this much (orders per year)
+MIN_TENURE_DAYS = 30
+RFM_BINS = 5
+
+# ---------------- Customer Metrics ----------------
+# One grouped pass reduces order lines to one row per order (customer, date, sales,
+# profit); everything per Customer ID is derived from that much smaller table:
+#   Recency        days from the last order to the day after the newest order in the data
+#   Total Orders   distinct orders (frequency)      Sales / Profit   monetary totals
+#   Tenure         days from the first order to the same reference day
+#   Orders / Year, Avg Order Value, CLV (simple, profit-based, over CLV_YEARS)
+#   R, F, M        1-5 quintile scores (5 = most recent / most frequent / highest sales)
+# The order table is additive, so an ingested batch is merged without rereading history
+# (an order whose lines arrive in two batches is summed back into one).
+_ORDER_AGG = {'Customer ID': ('Customer ID', 'first'), 'Customer Name': ('Customer Name', 'first'),
+              'Segment': ('Segment', 'first'), 'Order Date': ('Order Date', 'min'),
+              'Sales': ('Sales', 'sum'), 'Profit': ('Profit', 'sum')}
+
+def _orders(df):
+    orders = df.groupby('Order ID', observed=True, sort=False).agg(**_ORDER_AGG).reset_index()
+    for c in ['Order ID', 'Customer ID', 'Customer Name', 'Segment']: orders[c] = orders[c].astype(str)
+    return orders
+
+def _score(values):
+    # Quintile score 1..RFM_BINS by rank (ties broken by position, so every bin is used)
+    return np.ceil(values.rank(method='first', pct=True) * RFM_BINS).astype(np.int8)
+
+def _customers(orders):
+    if orders.empty:
+        return pd.DataFrame(columns=['Customer ID', 'Customer Name', 'Segment', 'First Order', 'Last Order',
+                                     'Total Orders', 'Sales', 'Profit', 'Recency', 'Tenure', 'Avg Order Value',
+                                     'Orders / Year', 'CLV', 'R', 'F', 'M', 'RFM Score'])
+    # Name and segment as of each customer's latest order
+    t = orders.sort_values('Order Date', kind='stable').groupby('Customer ID', sort=True).agg(**{
+        'Customer Name': ('Customer Name', 'last'), 'Segment': ('Segment', 'last'),
+        'First Order': ('Order Date', 'min'), 'Last Order': ('Order Date', 'max'),
+        'Total Orders': ('Order ID', 'size'), 'Sales': ('Sales', 'sum'), 'Profit': ('Profit', 'sum')}).reset_index()
+    as_of = t['Last Order'].max() + pd.Timedelta(days=1)
+    t['Recency'] = (as_of - t['Last Order']).dt.days
+    t['Tenure'] = (as_of - t['First Order']).dt.days
+    t['Avg Order Value'] = t['Sales'] / t['Total Orders']
+    t['Orders / Year'] = t['Total Orders'] / (t['Tenure'].clip(lower=MIN_TENURE_DAYS) / 365.25)
+    t['CLV'] = t['Profit'] / t['Total Orders'] * t['Orders / Year'] * CLV_YEARS
+    t['R'], t['F'], t['M'] = _score(-t['Recency']), _score(t['Total Orders']), _score(t['Sales'])
+    t['RFM Score'] = t['R'] + t['F'] + t['M']
+    return t
+
+class CustomerMetrics:
+    @instr.traced("customer_metrics_build")
+    def __init__(self, df):
+        self.rows = len(df)
+        self.orders = _orders(df[ORDER_COLS])
+        self.table = _customers(self.orders)
+
+    def merge(self, other):
+        orders = pd.concat([self.orders, other.orders], ignore_index=True)
+        if orders['Order ID'].duplicated().any():
+            orders = orders.groupby('Order ID', sort=False).agg(**_ORDER_AGG).reset_index()
+        self.orders = orders
+        self.table = _customers(orders)
+        self.rows += other.rows
+        return self
+
+    def save(self, path):
+        pd.to_pickle(self, path)
+
+def _metrics_path(path):
+    return os.path.join(snapshot_dir(path), "customers.pkl")
+
+def read_persisted_metrics(path):
+    # Like the persisted cube, only trusted when it covers exactly the snapshot's rows
+    meta = read_meta(snapshot_dir(path))
+    try: metrics = pd.read_pickle(_metrics_path(path))
+    except (OSError, EOFError, ValueError): return None
+    return metrics if meta is not None and metrics.rows == meta["rows"] else None
+
+# ---------------- Cached Access ----------------
+@st.cache_resource(max_entries=2) # Built once per dataset version and shared across sessions
+def _load_customer_metrics(path, version):
+    instr.cache_miss()
+    metrics = read_persisted_metrics(path)
+    if metrics is None:
+        metrics = CustomerMetrics(get_backend(path).rows(ALL_ROWS, path, ORDER_COLS))
+        if read_meta(snapshot_dir(path)) is not None:
+            try: metrics.save(_metrics_path(path))
+            except OSError: pass
+    return metrics
+
+@instr.traced(cached=True)
+def load_customer_metrics(path=DATA_PATH):
+    return _load_customer_metrics(path, dataset_version(path))
+
+@st.cache_data(max_entries=256)
+def _cached_filtered(filters, path, version):
+    instr.cache_miss()
+    return CustomerMetrics(get_backend(path).rows(filters, path, ORDER_COLS)).table
+
+@instr.traced(cached=True)
+def customer_table(filters=None, path=DATA_PATH):
+    # Per-customer metrics for a filter key (plot_functions.filter_key); the unfiltered
+    # table is the shared dataset-level one, filtered ones take one pass over their rows
+    if filters is None or all(v == "All" for v in filters): return load_customer_metrics(path).table
+    return _cached_filtered(tuple(filters), path, dataset_version(path))
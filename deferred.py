@@ -0,0 +1,65 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import instrumentation as instr
+
+# ---------------- Deferred Rendering ----------------
+# A page reserves an st.empty() slot for each expensive section (a fig_* builder, a model
+# fit), renders its cheap parts (filters, KPIs) straight away, then calls render_all():
+# every section's compute() runs on a shared thread pool and its slot is filled in the
+# script thread as soon as the result completes, so a slow chart no longer holds back
+# the ones after it. Threads rather than processes: the work is numpy / pandas /
+# statsmodels / scikit-learn (mostly GIL-free) and the st.cache_* stores it fills are
+# per process. Workers carry the page's script run context, so cached calls and
+# profiling spans are attributed to the session. Results of a rerun that is interrupted
+# still land in the caches.
+# SUPERSTORE_ASYNC=0 computes and renders the sections one by one, in page order.
+ASYNC = os.environ.get("SUPERSTORE_ASYNC", "1") not in ("", "0")
+MAX_WORKERS = int(os.environ.get("SUPERSTORE_ASYNC_WORKERS", "4"))
+
+@st.cache_resource # One pool per process, shared by every session
+def _executor(max_workers):
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+
+def _run(ctx, compute):
+    if ctx is not None: add_script_run_ctx(threading.current_thread(), ctx)
+    return compute()
+
+def chart(fig):
+    instr.plotly_chart(fig, use_container_width=True)
+
+class Section:
+    # A placeholder in the current container. compute() runs on the pool, render(result)
+    # in the script thread inside the placeholder; on_error(exc) replaces render when
+    # compute raises (without it the exception propagates to the page).
+    def __init__(self, compute, render=chart, on_error=None, message="Computing…"):
+        self.compute, self.render, self.on_error = compute, render, on_error
+        self.slot = st.empty()
+        self.slot.caption(f"⏳ {message}")
+
+    def fill(self, future):
+        with self.slot.container():
+            try:
+                result = future.result()
+            except Exception as e:
+                if self.on_error is None: raise
+                return self.on_error(e)
+            self.render(result)
+
+def _serial(compute):
+    f = Future()
+    try: f.set_result(compute())
+    except Exception as e: f.set_exception(e)
+    return f
+
+def render_all(sections):
+    if not ASYNC:
+        for s in sections: s.fill(_serial(s.compute))
+        return
+    ctx = get_script_run_ctx(suppress_warning=True)
+    pool = _executor(MAX_WORKERS)
+    futures = {pool.submit(_run, ctx, s.compute): s for s in sections}
+    for f in as_completed(futures):
+        futures[f].fill(f)
@@ -0,0 +1,123 @@
+import io
+import gzip
+import numpy as np
+import streamlit as st
+import data_loader as dl
+import instrumentation as instr
+
+# ---------------- Streaming Export ----------------
+# Downloads of filtered order lines and aggregates. Nothing is generated until the
+# download button is clicked: st.download_button runs a callable data source on its own
+# thread, so neither this page's reruns nor other sessions wait for it. The file is then
+# encoded CHUNK_ROWS rows at a time into an in-memory buffer (gzip-compressed for
+# csv.gz, one row group per chunk for Parquet), so only the encoded file is held, never
+# a second full-table string; Streamlit reads that buffer into bytes to serve it, so a
+# download costs about its file size in memory while it is served. Sizes shown next to
+# each format are extrapolated from encoding samples of the rows, once per content.
+CHUNK_ROWS = 100_000
+SAMPLE_ROWS = 4_000
+SAMPLE_BLOCKS = 8
+FORMATS = {
+    'csv': ('CSV', 'text/csv', '.csv'),
+    'csv.gz': ('CSV (gzip)', 'application/gzip', '.csv.gz'),
+}
+if dl._HAS_ARROW:
+    FORMATS['parquet'] = ('Parquet', 'application/vnd.apache.parquet', '.parquet')
+
+def iter_csv(df, chunk_rows=CHUNK_ROWS):
+    # UTF-8 CSV bytes, header first, one chunk of rows at a time
+    yield df.iloc[:0].to_csv(index=False).encode('utf-8')
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode('utf-8')
+
+def write_export(df, fmt, f, chunk_rows=CHUNK_ROWS):
+    # Writes df (index dropped; reset_index() first to keep it) to the binary file f
+    if fmt == 'csv':
+        for chunk in iter_csv(df, chunk_rows): f.write(chunk)
+    elif fmt == 'csv.gz':
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as gz:
+            for chunk in iter_csv(df, chunk_rows): gz.write(chunk)
+    elif fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+        with pq.ParquetWriter(f, schema) as writer:
+            for start in range(0, max(len(df), 1), chunk_rows):
+                writer.write_table(pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=schema, preserve_index=False))
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+@instr.traced("export_build")
+def build_export(df, fmt, chunk_rows=CHUNK_ROWS):
+    # io.BytesIO: one of the types st.download_button accepts from a callable data source
+    f = io.BytesIO()
+    write_export(df, fmt, f, chunk_rows)
+    f.seek(0)
+    return f
+
+class _Counter:
+    # Write-only sink that only counts bytes
+    closed = False
+    def __init__(self): self.n = 0
+    def write(self, b):
+        self.n += len(b)
+        return len(b)
+    def tell(self): return self.n
+    def flush(self): pass
+
+def _encoded_size(df, fmt):
+    sink = _Counter()
+    write_export(df, fmt, sink)
+    return sink.n
+
+def _blocks(n, rows, n_blocks=SAMPLE_BLOCKS):
+    # About `rows` positions as n_blocks contiguous runs spread over n rows (compression is local)
+    size = max(rows // n_blocks, 1)
+    starts = np.linspace(0, n - size, n_blocks).astype(int)
+    return np.unique(np.concatenate([np.arange(s, s + size) for s in starts]))
+
+@instr.traced("export_estimate")
+def estimate_sizes(df, formats=None, sample_rows=SAMPLE_ROWS, n_rows=None):
+    # {format: bytes} for n_rows rows like df's (default: df itself, otherwise df is a sample
+    # of at least sample_rows of them): exact up to sample_rows rows, otherwise a straight
+    # line through the encoded sizes of two block samples, which separates the fixed
+    # header / footer from the per-row cost
+    formats = formats or list(FORMATS)
+    n_rows = len(df) if n_rows is None else n_rows
+    if n_rows == len(df) <= sample_rows: return {fmt: _encoded_size(df, fmt) for fmt in formats}
+    small, large = df.iloc[_blocks(len(df), sample_rows // 4)], df.iloc[_blocks(len(df), sample_rows)]
+    sizes = {}
+    for fmt in formats:
+        s1, s2 = _encoded_size(small, fmt), _encoded_size(large, fmt)
+        per_row = (s2 - s1) / (len(large) - len(small))
+        sizes[fmt] = int(s2 + per_row * (n_rows - len(large)))
+    return sizes
+
+@st.cache_data(max_entries=256)
+def _cached_estimate(token, version, n_rows, _df):
+    instr.cache_miss()
+    return estimate_sizes(_df, n_rows=n_rows)
+
+def _human(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB': return f"{n:,.0f} {unit}" if unit == 'B' else f"{n:,.1f} {unit}"
+        n /= 1024
+
+def export_panel(df, name, key, token, load=None, n_rows=None):
+    # Format choice with size estimates and a download button that builds the file on
+    # click. token identifies df's content (e.g. the filter key) for the estimate cache.
+    # For row sets not worth reading on every rerun, pass load (a callable returning the
+    # rows, only run on click) and n_rows (their count); df is then a sample of them.
+    n_rows = len(df) if n_rows is None else n_rows
+    sizes = _cached_estimate(token, dl.dataset_version(), n_rows, df)
+    fmt = st.radio("Format", options=list(FORMATS), horizontal=True, key=f"{key}_fmt",
+                   format_func=lambda f: f"{FORMATS[f][0]} (≈ {_human(sizes[f])})")
+    label, mime, ext = FORMATS[fmt]
+    st.download_button(
+        label=f"Download {n_rows:,} rows as {label}",
+        data=lambda: build_export(df if load is None else load(), fmt),
+        file_name=f"{name}{ext}",
+        mime=mime,
+        on_click="ignore",
+        key=f"{key}_download",
+    )
@@ -0,0 +1,93 @@
+import os
+import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+import streamlit as st
+import pandas as pd
+import numpy as np
+from data_loader import load_data, dataset_version, DATA_PATH
+from backends import get_backend, ALL_ROWS
+import instrumentation as instr
+
+# statsmodels takes over a second to import, so it is loaded by the first fit rather
+# than by every page that imports plot_functions
+_HAS_STATS = importlib.util.find_spec("statsmodels") is not None
+
+MIN_MONTHS = 6
+
+# ---------------- Holt-Winters Fits ----------------
+def monthly_series(df, value='Sales'):
+    # Monthly totals on a regular month-start index (missing months are 0)
+    monthly = df.groupby('Order Month Sort')[value].sum()
+    return monthly.asfreq('MS').fillna(0) if len(monthly) else monthly
+
+@instr.traced()
+def fit_holt_winters(series):
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    model = ExponentialSmoothing(series, seasonal='add', seasonal_periods=12)
+    return model.fit(optimized=True)
+
+def can_forecast(series):
+    return _HAS_STATS and len(series) >= MIN_MONTHS
+
+# The fit does not depend on the horizon, so one fitted model per filter state serves
+# every position of the periods slider. None means the fit failed for this series.
+@st.cache_resource(max_entries=256)
+def _cached_fit(filters, path, version, _series):
+    instr.cache_miss()
+    try: return fit_holt_winters(_series)
+    except Exception: return None
+
+@instr.traced(cached=True)
+def fitted_model(filters, series, path=DATA_PATH):
+    return _cached_fit(filters, path, dataset_version(path), series)
+
+# ---------------- Batch Forecast Table ----------------
+# Fits every group (e.g. Region x Category) on a process pool and returns one long
+# table: group columns, 'Order Month Sort', 'Forecast'. Groups too short to fit, or
+# whose fit fails, are reported with an empty forecast and a Status.
+def _forecast_group(args):
+    key, series, periods = args
+    if not can_forecast(series):
+        return key, None, "too short"
+    try:
+        return key, fit_holt_winters(series).forecast(periods), "ok"
+    except Exception as e:
+        return key, None, f"failed: {e}"
+
+def forecast_table(df, by=('Region', 'Category'), periods=12, max_workers=None):
+    by = list(by)
+    wide = df.groupby(by + ['Order Month Sort'], observed=True)['Sales'].sum().unstack(by)
+    wide = wide.asfreq('MS').fillna(0)
+    tasks = [(key if isinstance(key, tuple) else (key,), wide[key], periods) for key in wide.columns]
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        results = list(pool.map(_forecast_group, tasks, chunksize=max(1, len(tasks) // 32)))
+    rows = []
+    for key, fcast, status in results:
+        group = dict(zip(by, key))
+        if fcast is None:
+            rows.append({**group, 'Order Month Sort': pd.NaT, 'Forecast': np.nan, 'Status': status})
+        else:
+            rows += [{**group, 'Order Month Sort': month, 'Forecast': value, 'Status': status}
+                     for month, value in fcast.items()]
+    return pd.DataFrame(rows, columns=by + ['Order Month Sort', 'Forecast', 'Status'])
+
+@st.cache_data(max_entries=8)
+def _cached_forecast_table(by, periods, path, version):
+    instr.cache_miss()
+    return forecast_table(get_backend(path).rows(ALL_ROWS, path, list(by) + ['Order Month Sort', 'Sales']), by, periods)
+
+@instr.traced(cached=True)
+def load_forecast_table(by=('Region', 'Category'), periods=12, path=DATA_PATH):
+    return _cached_forecast_table(tuple(by), periods, path, dataset_version(path))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit Holt-Winters forecasts for every group in parallel.")
+    parser.add_argument("--by", nargs="+", default=['Region', 'Category'])
+    parser.add_argument("--periods", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="forecasts.csv")
+    args = parser.parse_args()
+    table = forecast_table(load_data(), args.by, args.periods, args.workers)
+    table.to_csv(args.out, index=False)
+    print(f"Wrote {len(table)} rows to {args.out}")
@@ -0,0 +1,48 @@
+import streamlit as st
+from data_loader import dataset_version, DATA_PATH
+import instrumentation as instr
+from backends import get_backend, selection, ALL_ROWS
+
+# Dashboard filters the geo store is pre-aggregated by
+GEO_KEYS = ['Order Year', 'Region', 'Category']
+# Drill-down levels, coarsest first
+GEO_LEVELS = {
+    'State': ['State', 'State_Code'],
+    'City': ['State', 'City'],
+    'Postal Code': ['State', 'City', 'Postal Code'],
+}
+GEO_VALUES = ['Sales', 'Profit', 'Rows']
+# Order-line columns the store is built from
+GEO_COLUMNS = list(dict.fromkeys(GEO_KEYS + [c for cols in GEO_LEVELS.values() for c in cols] + ['Sales', 'Profit']))
+
+# ---------------- Geo Aggregate Store ----------------
+# One table per level at Year x Region x Category x geography grain. Map and drill-down
+# renders filter and roll up these small tables instead of rescanning order lines.
+class GeoStore:
+    @instr.traced("geo_store_build")
+    def __init__(self, df):
+        self.tables = {}
+        d = df.assign(Rows=1)
+        for level, cols in GEO_LEVELS.items():
+            if not set(cols) <= set(df.columns): continue
+            self.tables[level] = d.groupby(GEO_KEYS + cols, observed=True, as_index=False)[GEO_VALUES].sum()
+
+    @instr.traced("geo_query")
+    def query(self, level, year="All", region="All", category="All", state=None):
+        # Each filter is "All", a value or a tuple of values (multi-select)
+        t = self.tables[level]
+        sel = selection(year, region, category, "All")
+        for col in GEO_KEYS:
+            value = sel[col]
+            if value != "All": t = t[t[col].isin(value) if isinstance(value, tuple) else t[col] == value]
+        if state is not None: t = t[t['State'] == state]
+        return t.groupby(GEO_LEVELS[level], observed=True, as_index=False)[GEO_VALUES].sum()
+
+@st.cache_resource(max_entries=2) # Built once per dataset version and shared across sessions
+def _load_geo_store(path, version):
+    instr.cache_miss()
+    return GeoStore(get_backend(path).rows(ALL_ROWS, path, GEO_COLUMNS))
+
+@instr.traced(cached=True)
+def load_geo_store(path=DATA_PATH):
+    return _load_geo_store(path, dataset_version(path))
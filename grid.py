@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+import instrumentation as instr
+
+# ---------------- Paginated Grid ----------------
+# Result tables that can grow large (OLAP pivots, association rules) are searched,
+# sorted and sliced in the server process; st.dataframe only receives the visible
+# window of PAGE_SIZE rows (and MAX_COLUMNS value columns for very wide pivots), so the
+# browser payload stays bounded whatever the size of the result.
+PAGE_SIZE = 50
+MAX_COLUMNS = 30
+
+def _text_columns(table):
+    return [c for c in table.columns if not pd.api.types.is_numeric_dtype(table[c])]
+
+@instr.traced("grid_window")
+def window(table, query="", sort_by=None, descending=False, page=0, page_size=PAGE_SIZE,
+           key_columns=(), column_page=0, max_columns=MAX_COLUMNS):
+    # (visible slice, matching rows, row pages, column pages); pages are 0-based and
+    # pages past the end show the last one. The search is a case-insensitive substring
+    # match on the label (non-numeric) columns; key columns are always shown.
+    if query:
+        match = np.zeros(len(table), dtype=bool)
+        for c in _text_columns(table):
+            match |= table[c].astype(str).str.contains(query, case=False, regex=False).to_numpy()
+        table = table[match]
+    if sort_by is not None:
+        table = table.sort_values(sort_by, ascending=not descending, kind='stable', na_position='last')
+    n_pages = max(1, -(-len(table) // page_size))
+    page = min(page, n_pages - 1)
+    values = [c for c in table.columns if c not in key_columns]
+    n_col_pages = max(1, -(-len(values) // max_columns))
+    column_page = min(column_page, n_col_pages - 1)
+    cols = list(key_columns) + values[column_page * max_columns:(column_page + 1) * max_columns]
+    return table.iloc[page * page_size:(page + 1) * page_size][cols], len(table), n_pages, n_col_pages
+
+def paged_grid(table, key, sort_by=None, descending=False, key_columns=(), column_config=None, page_size=PAGE_SIZE):
+    # Search / sort / page controls and the visible window of `table`; `key` namespaces
+    # the widgets so several grids can live on one page
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    query = col1.text_input("Search", key=f"{key}_query", placeholder="Text in any label column")
+    options = [None] + list(table.columns)
+    sort_by = col2.selectbox("Sort by", options=options, index=options.index(sort_by) if sort_by in options else 0,
+                             format_func=lambda c: "(unsorted)" if c is None else str(c), key=f"{key}_sort")
+    descending = col3.checkbox("Descending", value=descending, key=f"{key}_desc")
+    page = col4.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+    column_page = 1
+    if len(table.columns) - len(key_columns) > MAX_COLUMNS:
+        column_page = st.number_input("Column page", min_value=1, value=1, step=1, key=f"{key}_colpage")
+    view, n_rows, n_pages, n_col_pages = window(table, query, sort_by, descending, page - 1, page_size,
+                                                key_columns, column_page - 1)
+    st.dataframe(view, hide_index=True, use_container_width=True, column_config=column_config)
+    first = (min(page, n_pages) - 1) * page_size
+    caption = f"Rows {min(first + 1, n_rows):,}–{first + len(view):,} of {n_rows:,} · page {min(page, n_pages)} of {n_pages}"
+    if n_col_pages > 1: caption += f" · columns page {min(column_page, n_col_pages)} of {n_col_pages}"
+    st.caption(caption)
+    return view
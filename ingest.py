@@ -0,0 +1,69 @@
+import os
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+import data_loader as dl
+from olap_cube import OlapCube, read_persisted_cube
+from customer_metrics import CustomerMetrics, read_persisted_metrics
+
+# ---------------- Incremental Ingestion ----------------
+# Appends new order batches (CSV files dropped into data/incoming/) to the columnar
+# snapshot without reprocessing history:
+#   * each file is prepared on its own (derived columns, categoricals),
+#   * lines already present (by Row ID + Order ID hash) are dropped against the
+#     persisted per-part key arrays,
+#   * the remainder becomes a new snapshot part and is merged into the persisted cube
+#     and customer metrics.
+# Running servers pick the new rows up on their next rerun via dataset_version().
+# Usage: python ingest.py [delta_dir] [--data data/Superstore.csv]
+
+def ingest_deltas(path=dl.DATA_PATH, delta_dir=dl.INCOMING_DIR):
+    if not dl._HAS_ARROW:
+        raise RuntimeError("Incremental ingestion requires pyarrow for the columnar snapshot.")
+    # The whole run holds the snapshot lock: two runs cannot both write part-N, and a
+    # server refreshing meta.json cannot drop a part that deltas.json already records
+    with dl.snapshot_lock(path):
+        return _ingest(path, delta_dir)
+
+def _ingest(path, delta_dir):
+    if not dl.snapshot_is_valid(path):
+        dl.build_dataset(path)
+    snap_dir = dl.snapshot_dir(path)
+    registry = dl.read_delta_registry(snap_dir)
+    key_parts = dl.load_row_keys(path)
+    cube = read_persisted_cube(path) or OlapCube(dl.read_snapshot(path))
+    customers = read_persisted_metrics(path) or CustomerMetrics(dl.read_snapshot(path))
+
+    report = []
+    for file in sorted(glob.glob(os.path.join(delta_dir, "*.csv"))):
+        name, info = os.path.basename(file), dl.source_info(file)
+        if {k: registry.get(name, {}).get(k) for k in info} == info: continue
+        delta = dl.prepare_data(pd.read_csv(file, encoding="latin1"))
+        keys = dl.row_keys(delta)
+        new = ~dl.keys_seen(key_parts, keys)
+        delta, keys = delta[new].reset_index(drop=True), keys[new]
+        if len(delta):
+            dl.append_snapshot_part(delta, path, keys)
+            key_parts.append(np.sort(keys))
+            cube.merge(OlapCube(delta))
+            customers.merge(CustomerMetrics(delta))
+        registry[name] = dict(info, rows=int(len(delta)), skipped=int((~new).sum()))
+        report.append((name, len(delta), int((~new).sum())))
+
+    if report:
+        cube.save(os.path.join(snap_dir, "cube.pkl"))
+        customers.save(os.path.join(snap_dir, "customers.pkl"))
+        dl.write_delta_registry(snap_dir, registry)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new Superstore order batches to the cached dataset.")
+    parser.add_argument("delta_dir", nargs="?", default=dl.INCOMING_DIR)
+    parser.add_argument("--data", default=dl.DATA_PATH)
+    args = parser.parse_args()
+    report = ingest_deltas(args.data, args.delta_dir)
+    for name, added, skipped in report:
+        print(f"{name}: {added} new rows, {skipped} duplicates skipped")
+    if not report:
+        print("No new delta files.")
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from collections import defaultdict
+from logging.handlers import RotatingFileHandler
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# ---------------- Profiling Spans ----------------
+# Opt-in timing of the hot path. With SUPERSTORE_PROFILE=1 every traced call (dataset
+# load, filters, KPIs, fig_* builders, model fits, chart serialization) records a span:
+# duration, rows in / out, and for cache-backed calls whether the cache hit. Spans are
+# buffered per session and shown at the end of each rerun by debug_panel(); they can
+# also go to a rotating JSON-lines log and a Prometheus text file:
+#   SUPERSTORE_PROFILE_LOG=logs/spans.jsonl   SUPERSTORE_PROFILE_PROM=metrics/superstore.prom
+# With profiling off, traced() returns the function unchanged.
+ENABLED = os.environ.get("SUPERSTORE_PROFILE", "") not in ("", "0")
+LOG_PATH = os.environ.get("SUPERSTORE_PROFILE_LOG")
+PROM_PATH = os.environ.get("SUPERSTORE_PROFILE_PROM")
+
+_local = threading.local()  # stack of open spans per thread
+_lock = threading.Lock()
+_buffers = defaultdict(list)  # session id -> finished spans of the current rerun
+_totals = defaultdict(lambda: [0, 0.0, 0, 0])  # span name -> [count, seconds, cache hits, cache misses]
+_logger = None
+
+def _rows(obj):
+    if isinstance(obj, tuple) and obj: obj = obj[0]
+    return len(obj) if isinstance(obj, (pd.DataFrame, pd.Series)) else None
+
+def _session_id():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+def _log():
+    global _logger
+    if _logger is None and LOG_PATH:
+        os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+        _logger = logging.getLogger("superstore.spans")
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        _logger.addHandler(RotatingFileHandler(LOG_PATH, maxBytes=10 * 2**20, backupCount=5))
+    return _logger
+
+class span:
+    # Context manager for one timed step. cached=True starts the span as a cache hit;
+    # the cached function body calls cache_miss() when it actually runs.
+    def __init__(self, name, rows_in=None, cached=False):
+        self.record = {"name": name, "rows_in": rows_in, "rows_out": None, "cache": "hit" if cached else None}
+
+    def __enter__(self):
+        if not ENABLED: return self
+        self.stack = _local.__dict__.setdefault("stack", [])
+        self.record["depth"] = len(self.stack)
+        self.record["ts"] = time.time()
+        self.stack.append(self.record)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if not ENABLED: return False
+        r = self.record
+        r["ms"] = round(1000 * (time.perf_counter() - self.start), 2)
+        self.stack.pop()
+        with _lock:
+            sid = _session_id()
+            if sid is not None: _buffers[sid].append(r)
+            t = _totals[r["name"]]
+            t[0] += 1; t[1] += r["ms"] / 1000
+            if r["cache"] == "hit": t[2] += 1
+            elif r["cache"] == "miss": t[3] += 1
+        if _log(): _logger.info(json.dumps(r, default=str))
+        return False
+
+    def rows_out(self, obj):
+        self.record["rows_out"] = _rows(obj)
+        return obj
+
+def cache_miss():
+    # Called from inside a cached function body: the nearest cache-backed span missed
+    if not ENABLED: return
+    for r in reversed(getattr(_local, "stack", [])):
+        if r["cache"] is not None:
+            r["cache"] = "miss"
+            return
+
+def traced(name=None, cached=False):
+    def wrap(fn):
+        if not ENABLED: return fn
+        label = name or fn.__name__
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            df = next((a for a in args if isinstance(a, pd.DataFrame)), kwargs.get("filtered_df"))
+            with span(label, _rows(df), cached) as s:
+                return s.rows_out(fn(*args, **kwargs))
+        return inner
+    return wrap
+
+def plotly_chart(fig, **kwargs):
+    # st.plotly_chart with the figure serialization timed
+    with span("plotly_chart"):
+        return st.plotly_chart(fig, **kwargs)
+
+# ---------------- Debug Panel & Exporters ----------------
+def prometheus_path(path=PROM_PATH):
+    # Totals are per process, so each process writes its own file (metrics/superstore.prom
+    # -> metrics/superstore-<pid>.prom); the textfile collector reads them all
+    root, ext = os.path.splitext(path)
+    return f"{root}-{os.getpid()}{ext}"
+
+def write_prometheus(path=PROM_PATH):
+    if not path: return
+    with _lock: totals = {k: list(v) for k, v in _totals.items()}
+    # A pid label keeps the series of different processes apart, so none looks like a reset
+    pid = os.getpid()
+    lines = ["# TYPE superstore_span_seconds summary"]
+    for name, (count, secs, _, _) in sorted(totals.items()):
+        lines += [f'superstore_span_seconds_sum{{span="{name}",pid="{pid}"}} {secs:.6f}',
+                  f'superstore_span_seconds_count{{span="{name}",pid="{pid}"}} {count}']
+    lines.append("# TYPE superstore_span_cache_total counter")
+    for name, (_, _, hits, misses) in sorted(totals.items()):
+        if hits or misses:
+            lines += [f'superstore_span_cache_total{{span="{name}",result="hit",pid="{pid}"}} {hits}',
+                      f'superstore_span_cache_total{{span="{name}",result="miss",pid="{pid}"}} {misses}']
+    path = prometheus_path(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f: f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+def debug_panel():
+    # Call last on a page: shows this rerun's spans in the sidebar and clears them
+    if not ENABLED: return
+    with _lock: spans = _buffers.pop(_session_id(), [])
+    write_prometheus()
+    with st.sidebar.expander("🛠 Profiling (this rerun)", expanded=False):
+        if not spans:
+            st.caption("No spans recorded.")
+            return
+        table = pd.DataFrame(spans).sort_values("ts")
+        table["name"] = ["· " * d + n for d, n in zip(table["depth"], table["name"])]
+        top = table[table["depth"] == 0]["ms"].sum()
+        st.caption(f"{len(table)} spans, {top:,.0f} ms in top-level spans")
+        st.dataframe(table[["name", "ms", "rows_in", "rows_out", "cache"]], hide_index=True, use_container_width=True)
@@ -0,0 +1,117 @@
+import os
+import itertools
+import streamlit as st
+import pandas as pd
+import numpy as np
+from data_loader import dataset_version, snapshot_dir, read_meta, DATA_PATH
+from backends import get_backend, selection, ALL_ROWS
+import instrumentation as instr
+
+# Fixed choices offered on the OLAP page
+OLAP_DIMS = ['Category', 'Sub-Category', 'Region', 'State', 'Segment']
+OLAP_VALUES = ['Sales', 'Profit', 'Quantity']
+OLAP_AGGS = ['sum', 'mean', 'count', 'std']
+# Filters the page applies on top of the pivot
+CUBE_KEYS = ['Order Year', 'Region']
+# Order-line columns the cube is built from
+CUBE_COLUMNS = list(dict.fromkeys(CUBE_KEYS + OLAP_DIMS + OLAP_VALUES))
+
+# ---------------- Materialised Cube ----------------
+# One pre-aggregated table per unordered pair of OLAP_DIMS at Year x Region x pair grain.
+# Each cell keeps sum, count and sum of squares per value, which is enough to roll up
+# sum / count / mean / std for any filter on Year and Region without touching order lines.
+def _pair_key(a, b):
+    return tuple(sorted((a, b)))
+
+def _cube_keys(pair):
+    return list(dict.fromkeys(CUBE_KEYS + list(pair)))
+
+def _aggregate(df, keys, values):
+    data = df[keys + values].copy()
+    aggs = {}
+    for v in values:
+        data[f'{v} sq'] = data[v].astype(float) ** 2
+        aggs[f'{v} sum'] = (v, 'sum')
+        aggs[f'{v} count'] = (v, 'count')
+        aggs[f'{v} sumsq'] = (f'{v} sq', 'sum')
+    return data.groupby(keys, observed=True).agg(**aggs).reset_index()
+
+class OlapCube:
+    @instr.traced("olap_cube_build")
+    def __init__(self, df):
+        dims = [d for d in OLAP_DIMS if d in df.columns]
+        self.values = [v for v in OLAP_VALUES if v in df.columns]
+        self.rows = len(df)
+        self.tables = {}
+        for a, b in itertools.combinations(dims, 2):
+            pair = _pair_key(a, b)
+            self.tables[pair] = _aggregate(df, _cube_keys(pair), self.values)
+
+    def merge(self, other):
+        # All stored moments are additive, so appending a batch only re-sums the cells
+        for pair, t in self.tables.items():
+            both = pd.concat([t, other.tables[pair]], ignore_index=True)
+            keys = _cube_keys(pair)
+            for k in keys:
+                if isinstance(t[k].dtype, pd.CategoricalDtype): both[k] = both[k].astype('category')
+            self.tables[pair] = both.groupby(keys, observed=True, as_index=False).sum()
+        self.rows += other.rows
+        return self
+
+    def save(self, path):
+        pd.to_pickle(self, path)
+
+    @property
+    def n_cells(self):
+        return sum(len(t) for t in self.tables.values())
+
+    @instr.traced("olap_cube_pivot")
+    def pivot(self, year, region, index, columns, value, agg):
+        # Same shape as pd.pivot_table(filtered, index, columns, value, aggfunc=agg, fill_value=0)
+        # year / region: "All", a value or a list / tuple of values (multi-select)
+        t = self.tables[_pair_key(index, columns)]
+        sel = selection(year, region, "All", "All")
+        for col in CUBE_KEYS:
+            want = sel[col]
+            if want == "All": continue
+            t = t[t[col].isin(want) if isinstance(want, tuple) else t[col] == want]
+        cells = t.groupby([index, columns], observed=True)[[f'{value} sum', f'{value} count', f'{value} sumsq']].sum()
+        s, n, q = cells[f'{value} sum'], cells[f'{value} count'], cells[f'{value} sumsq']
+        if agg == 'sum': out = s
+        elif agg == 'count': out = n
+        elif agg == 'mean': out = s / n
+        elif agg == 'std':
+            var = (q - s * s / n) / (n - 1).where(n > 1)
+            # Like pivot_table, rows/columns where no cell has a defined std are dropped
+            table = np.sqrt(var.clip(lower=0)).rename(value).unstack(columns)
+            table = table.dropna(how='all').dropna(axis=1, how='all').fillna(0)
+        else: raise ValueError(f"Unsupported aggregation: {agg}")
+        if agg != 'std': table = out.rename(value).unstack(columns, fill_value=0)
+        # Plain axes rather than CategoricalIndex so the table serialises cleanly
+        table.index, table.columns = table.index.astype(object), table.columns.astype(object)
+        return table
+
+def _cube_path(path):
+    return os.path.join(snapshot_dir(path), "cube.pkl")
+
+def read_persisted_cube(path):
+    # The persisted cube is only trusted when it covers exactly the snapshot's rows
+    meta = read_meta(snapshot_dir(path))
+    try: cube = pd.read_pickle(_cube_path(path))
+    except (OSError, EOFError, ValueError): return None
+    return cube if meta is not None and cube.rows == meta["rows"] else None
+
+@st.cache_resource(max_entries=2) # Built once per dataset version and shared across sessions
+def _load_olap_cube(path, version):
+    instr.cache_miss()
+    cube = read_persisted_cube(path)
+    if cube is None:
+        cube = OlapCube(get_backend(path).rows(ALL_ROWS, path, CUBE_COLUMNS))
+        if read_meta(snapshot_dir(path)) is not None:
+            try: cube.save(_cube_path(path))
+            except OSError: pass
+    return cube
+
+@instr.traced(cached=True)
+def load_olap_cube(path=DATA_PATH):
+    return _load_olap_cube(path, dataset_version(path))
@@ -1,11 +1,13 @@
 import streamlit as st
-from data_loader import load_data
 import plot_functions as pf
+import instrumentation as instr
+import export
+import warmup
 
 st.set_page_config(page_title="Dashboard", page_icon="🌎", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 # --- Page Title ---
 st.title("🌎 Profitability & Geographical Dashboard")
@@ -13,19 +15,25 @@ st.title("🌎 Profitability & Geographical Dashboard")
 # --- Filters ---
 st.sidebar.header("Dashboard Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
-category_choices = ["All"] + sorted(df['Category'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
+category_choices = pf.filter_choices('Category')[1:]
+date_min, date_max = pf.date_limits()
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-sel_category = st.sidebar.selectbox('Category', options=category_choices)
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
+sel_category = st.sidebar.multiselect('Category', options=category_choices, placeholder="All")
+sel_dates = st.sidebar.date_input('Order Date range', value=(), min_value=date_min, max_value=date_max)
+sel_scatter = st.sidebar.radio('Scatter view', options=['Sampled points', 'Density'], horizontal=True)
+sel_points = st.sidebar.number_input('Max scatter points', min_value=500, max_value=50000, value=pf.MAX_SCATTER_POINTS, step=500)
 
 # --- Apply Filters ---
-filtered_df = pf.apply_filters(df, sel_year, sel_region, sel_category, "All")
+# Only the columns the scatter plot shows are read (cached per filter state)
+flt = pf.filter_key(sel_year, sel_region, sel_category, "All", sel_dates)
+filtered_df = pf.filtered_rows(flt, ['Sales', 'Profit', 'Region', 'Order ID', 'Customer Name', 'Sub-Category'])
 
 # --- KPIs ---
-kpis = pf.compute_kpis(filtered_df)
+kpis = pf.compute_kpis(filters=flt)
 col1, col2, col3, col4 = st.columns(4)
 col1.metric("Total Sales", f"${kpis['total_sales']:,.2f}")
 col2.metric("Total Profit", f"${kpis['total_profit']:,.2f}")
@@ -37,8 +45,24 @@ st.markdown("---")
 # --- Charts ---
 col1, col2 = st.columns(2)
 with col1:
-    st.plotly_chart(pf.fig_profit_vs_sales(filtered_df), use_container_width=True)
+    instr.plotly_chart(pf.fig_profit_vs_sales(filtered_df, sel_points, 'density' if sel_scatter == 'Density' else 'sample'), use_container_width=True)
 with col2:
-    st.plotly_chart(pf.fig_profit_by_category(filtered_df), use_container_width=True)
+    instr.plotly_chart(pf.fig_profit_by_category(filters=flt), use_container_width=True)
 
-st.plotly_chart(pf.fig_sales_by_state(filtered_df), use_container_width=True)
\ No newline at end of file
+instr.plotly_chart(pf.fig_sales_by_state(filters=flt), use_container_width=True)
+
+# --- Geography Drill-down ---
+col1, col2 = st.columns(2)
+sel_level = col1.selectbox('Drill down to', options=['City', 'Postal Code'])
+sel_state = col2.selectbox('State', options=pf.filter_choices('State'))
+instr.plotly_chart(pf.fig_geo_drilldown(flt, sel_level, None if sel_state == "All" else sel_state), use_container_width=True)
+
+# --- Export ---
+# Every column is read only on click, then encoded chunk by chunk in the chosen format;
+# sizes are estimated from a sample of the lines
+with st.expander("Export filtered order lines"):
+    export.export_panel(pf.filtered_rows(flt, limit=export.SAMPLE_ROWS), "superstore_orders", key="orders_export",
+                        token=('rows', flt), load=lambda: pf.order_lines(flt), n_rows=len(filtered_df))
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
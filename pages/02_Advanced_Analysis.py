@@ -1,11 +1,14 @@
 import streamlit as st
-from data_loader import load_data
 import plot_functions as pf
+import instrumentation as instr
+import export
+import deferred
+import warmup
 
 st.set_page_config(page_title="Advanced Analysis", page_icon="🔍", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 # --- Page Title ---
 st.title("🔍 Advanced Analysis")
@@ -13,22 +16,26 @@ st.title("🔍 Advanced Analysis")
 # --- Filters ---
 st.sidebar.header("Analysis Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
-category_choices = ["All"] + sorted(df['Category'].unique())
-segment_choices = ["All"] + sorted(df['Segment'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
+category_choices = pf.filter_choices('Category')[1:]
+segment_choices = pf.filter_choices('Segment')[1:]
+date_min, date_max = pf.date_limits()
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-sel_category = st.sidebar.selectbox('Category', options=category_choices)
-sel_segment = st.sidebar.selectbox('Segment', options=segment_choices)
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
+sel_category = st.sidebar.multiselect('Category', options=category_choices, placeholder="All")
+sel_segment = st.sidebar.multiselect('Segment', options=segment_choices, placeholder="All")
+sel_dates = st.sidebar.date_input('Order Date range', value=(), min_value=date_min, max_value=date_max)
 sel_top_n = st.sidebar.slider("Top N Customers", 1, 20, 10)
 
 # --- Apply Filters ---
-filtered_df = pf.apply_filters(df, sel_year, sel_region, sel_category, sel_segment)
+# Only the columns the funnel, heatmap and cohorts use are read (cached per filter state)
+flt = pf.filter_key(sel_year, sel_region, sel_category, sel_segment, sel_dates)
+filtered_df = pf.filtered_rows(flt, ['Order ID', 'Customer ID', 'Order Date', 'Delivery Days', 'Profit', 'Discount', 'Category'])
 
 # --- KPIs ---
-kpis = pf.compute_kpis(filtered_df)
+kpis = pf.compute_kpis(filters=flt)
 col1, col2, col3, col4 = st.columns(4)
 col1.metric("Total Sales", f"${kpis['total_sales']:,.2f}")
 col2.metric("Total Profit", f"${kpis['total_profit']:,.2f}")
@@ -38,10 +45,34 @@ col4.metric("Total Orders", f"{kpis['total_orders']:,}")
 st.markdown("---")
 
 # --- Charts ---
+# The four figures are independent: they are built concurrently and each slot fills as soon as its figure is ready
 col1, col2 = st.columns(2)
 with col1:
-    st.plotly_chart(pf.fig_top_customers(filtered_df, sel_top_n), use_container_width=True)
-    st.plotly_chart(pf.fig_funnel_analysis(filtered_df), use_container_width=True)
+    charts = [deferred.Section(lambda: pf.fig_top_customers(top_n=sel_top_n, filters=flt)),
+              deferred.Section(lambda: pf.fig_funnel_analysis(filtered_df))]
 with col2:
-    st.plotly_chart(pf.fig_discount_heatmap(filtered_df), use_container_width=True)
-    st.plotly_chart(pf.fig_cohort_analysis(filtered_df), use_container_width=True)
\ No newline at end of file
+    charts += [deferred.Section(lambda: pf.fig_discount_heatmap(filtered_df)),
+               deferred.Section(lambda: pf.fig_cohort_analysis(filtered_df))]
+deferred.render_all(charts)
+
+# --- Cohort Drill-down ---
+# Paged: only one page of a cohort's customers is computed and sent at a time
+if not filtered_df.empty:
+    with st.expander("Cohort drill-down (orders per customer by months since acquisition)"):
+        cohorts = pf.cohort_retention(filtered_df).index.tolist()
+        col1, col2 = st.columns(2)
+        sel_cohort = col1.selectbox("Acquisition month", options=cohorts)
+        sel_page = col2.number_input("Page", min_value=1, value=1)
+        cohort_table, n_pages = pf.cohort_customers(filtered_df, sel_cohort, sel_page - 1)
+        st.caption(f"Page {min(sel_page, n_pages)} of {n_pages}")
+        st.dataframe(cohort_table, use_container_width=True)
+
+# --- Export ---
+# Every column is read only on click, then encoded chunk by chunk in the chosen format;
+# sizes are estimated from a sample of the lines
+with st.expander("Export filtered order lines"):
+    export.export_panel(pf.filtered_rows(flt, limit=export.SAMPLE_ROWS), "superstore_orders", key="orders_export",
+                        token=('rows', flt), load=lambda: pf.order_lines(flt), n_rows=len(filtered_df))
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
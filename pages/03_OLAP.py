@@ -1,13 +1,19 @@
 import streamlit as st
-from data_loader import load_data
-import plot_functions as pf
-import pandas as pd
+from olap_cube import load_olap_cube, OLAP_DIMS, OLAP_VALUES, OLAP_AGGS
 import plotly.express as px
+import instrumentation as instr
+import plot_functions as pf
+import grid
+import export
+import warmup
 
 st.set_page_config(page_title="OLAP", page_icon="🗃️", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
+
+# Load the pre-aggregated cube
+cube = load_olap_cube()
 
 # --- Page Title ---
 st.title("🗃️ Dynamic OLAP Pivot Table")
@@ -15,22 +21,19 @@ st.title("🗃️ Dynamic OLAP Pivot Table")
 # --- Filters ---
 st.sidebar.header("OLAP Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-
-# --- Apply Filters ---
-filtered_df = pf.apply_filters(df, sel_year, sel_region, "All", "All")
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
 
 # --- OLAP Controls ---
 st.markdown("### Pivot Table Controls")
 col1, col2, col3 = st.columns(3)
 
-olap_choices = ['Category','Sub-Category','Region','State', 'Segment']
-val_choices = ['Sales','Profit','Quantity']
-agg_choices = ['sum','mean','count']
+olap_choices = OLAP_DIMS
+val_choices = OLAP_VALUES
+agg_choices = OLAP_AGGS
 
 with col1:
     sel_index = st.selectbox("Index (Rows)", options=olap_choices, index=0)
@@ -48,27 +51,27 @@ else:
     st.markdown("---")
     st.subheader(f"{sel_agg.capitalize()} of {sel_val} by {sel_index} and {sel_cols}")
     
-    pivot = pd.pivot_table(filtered_df, 
-                           index=sel_index, 
-                           columns=sel_cols, 
-                           values=sel_val, 
-                           aggfunc=sel_agg, 
-                           fill_value=0)
+    # Filters are applied to the pre-aggregated cube, not the order lines
+    pivot = cube.pivot(sel_year, sel_region, sel_index, sel_cols, sel_val, sel_agg)
     
-    st.dataframe(pivot, use_container_width=True)
+    # Searched, sorted and paged on the server; only the visible window is sent
+    table = pivot.reset_index()
+    table.columns = table.columns.map(str)
+    grid.paged_grid(table, key="olap", key_columns=[sel_index])
     
     # --- Pivot Heatmap ---
+    # Cell labels only while the pivot is small enough to read them
     fig_heatmap = px.imshow(pivot, 
-                            text_auto=True, 
+                            text_auto=pivot.size <= pf.HEATMAP_TEXT_CELLS, 
                             color_continuous_scale='Viridis',
                             title=f"Heatmap: {sel_agg.capitalize()} of {sel_val}")
-    st.plotly_chart(fig_heatmap, use_container_width=True)
+    instr.plotly_chart(fig_heatmap, use_container_width=True)
     
     # --- Download ---
-    csv = pivot.to_csv().encode('utf-8')
-    st.download_button(
-        label="Download Pivot Table as CSV",
-        data=csv,
-        file_name=f"{sel_val}_pivot.csv",
-        mime="text/csv",
-    )
\ No newline at end of file
+    # Built on click in the chosen format; the size estimate is cached per pivot
+    st.markdown("**Download Pivot Table**")
+    export.export_panel(table, f"{sel_val}_pivot", key="olap_export",
+                        token=('pivot', tuple(sel_year), tuple(sel_region), sel_index, sel_cols, sel_val, sel_agg))
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
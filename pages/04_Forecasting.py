@@ -1,33 +1,55 @@
 import streamlit as st
-from data_loader import load_data
 import plot_functions as pf
+import forecasting as fc
+import instrumentation as instr
+import deferred
+import warmup
 
 st.set_page_config(page_title="Forecasting", page_icon="🔮", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 # --- Page Title ---
 st.title("🔮 Sales Forecasting")
 
 # --- Filters ---
+# Choices and date bounds are cached query-backend lookups; this page keeps no order lines of its own
 st.sidebar.header("Forecast Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
-category_choices = ["All"] + sorted(df['Category'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
+category_choices = pf.filter_choices('Category')[1:]
+date_min, date_max = pf.date_limits()
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-sel_category = st.sidebar.selectbox('Category', options=category_choices)
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
+sel_category = st.sidebar.multiselect('Category', options=category_choices, placeholder="All")
+sel_dates = st.sidebar.date_input('Order Date range', value=(), min_value=date_min, max_value=date_max)
 sel_periods = st.sidebar.slider("Forecast Periods (Months)", 1, 12, 6)
 
 # --- Apply Filters ---
-filtered_df = pf.apply_filters(df, sel_year, sel_region, sel_category, "All")
+# Both charts are served from the shared aggregate cache; the fitted model is cached per filter state
+flt = pf.filter_key(sel_year, sel_region, sel_category, "All", sel_dates)
 
 # --- Charts ---
+# The actual-sales chart does not wait for the model fit
 st.subheader("Sales Forecast (Holt-Winters Model)")
-st.plotly_chart(pf.fig_forecast(filtered_df, sel_periods), use_container_width=True)
+forecast = deferred.Section(lambda: pf.fig_forecast(periods=sel_periods, filters=flt), message="Fitting the forecast model…")
 
 st.subheader("Actual Monthly Sales (for context)")
-st.plotly_chart(pf.fig_monthly_sales(filtered_df), use_container_width=True)
\ No newline at end of file
+actual = deferred.Section(lambda: pf.fig_monthly_sales(filters=flt))
+deferred.render_all([forecast, actual])
+
+# --- Batch Forecasts ---
+# Precomputed on a process pool for every Region x Category and cached per dataset
+if st.checkbox("Show 12-month forecasts for every Region × Category"):
+    table = fc.load_forecast_table(('Region', 'Category'), 12)
+    st.dataframe(
+        table.pivot_table(index=['Region', 'Category'], columns='Order Month Sort', values='Forecast', observed=True)
+        .rename(columns=lambda c: c.strftime('%Y-%m')),
+        use_container_width=True
+    )
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
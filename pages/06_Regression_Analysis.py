@@ -1,13 +1,15 @@
 import streamlit as st
 import plotly.express as px
-from data_loader import load_data
+import plotly.graph_objects as go
 import plot_functions as pf
-from scipy import stats # Import for statistical calculations
+import regression as rg
+import instrumentation as instr
+import warmup
 
 st.set_page_config(page_title="Regression Analysis", page_icon="📉", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 st.title("📉 Regression Analysis: Discount vs. Profit")
 st.markdown("Does offering a higher discount lead to higher or lower profit?")
@@ -15,43 +17,42 @@ st.markdown("Does offering a higher discount lead to higher or lower profit?")
 # --- Filters ---
 st.sidebar.header("Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
-category_choices = ["All"] + sorted(df['Category'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
+category_choices = pf.filter_choices('Category')[1:]
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-sel_category = st.sidebar.selectbox('Category', options=category_choices)
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
+sel_category = st.sidebar.multiselect('Category', options=category_choices, placeholder="All")
 
 # --- Apply Filters ---
-# We filter the data first based on user selection
-filtered_df = pf.apply_filters(df, sel_year, sel_region, sel_category, "All")
-
-# For this analysis, we only want to see data where a discount was given
-df_analysis = filtered_df[filtered_df['Discount'] > 0]
+# For this analysis, we only want to see data where a discount was given: the
+# backend applies Discount > 0 along with the filters and reads only the two columns
+df_analysis = pf.filtered_rows(pf.filter_key(sel_year, sel_region, sel_category, "All"), ['Discount', 'Profit'], discounted=True)
 
 if not df_analysis.empty:
     # --- Algorithm: Linear Regression ---
-    # Plotly Express can run the 'ols' (Ordinary Least Squares) regression algorithm
+    # Same numbers as scipy.stats.linregress on the full data, from the cached
+    # per-partition sufficient statistics (regression.py) instead of the rows
+    fit = rg.linregress((sel_year, sel_region, sel_category), 'Discount')
+    slope, intercept, p_value = fit['slope'], fit['intercept'], fit['p_value']
+    r_squared = fit['r']**2
+
+    # Only a sample of the points is sent to the browser; the OLS line uses the full fit above
+    points = pf.downsample_points(df_analysis, 'Discount', 'Profit', strata='Discount')
     fig = px.scatter(
-        df_analysis,
+        points,
         x="Discount",
         y="Profit",
-        title="Profit vs. Discount (where Discount > 0)",
-        trendline="ols" # This line tells Plotly to run the regression
+        title=pf.sampled_title("Profit vs. Discount (where Discount > 0)", len(points), len(df_analysis))
     )
-    st.plotly_chart(fig, use_container_width=True)
+    x_line = [df_analysis['Discount'].min(), df_analysis['Discount'].max()]
+    fig.add_trace(go.Scatter(x=x_line, y=[slope * x + intercept for x in x_line], mode='lines', name='OLS trendline'))
+    instr.plotly_chart(fig, use_container_width=True)
 
     # --- Calculate and Display Stats ---
     st.subheader("Statistical Model Results")
     
-    # Run the algorithm using scipy.stats to get the detailed numbers
-    slope, intercept, r_value, p_value, std_err = stats.linregress(
-        df_analysis['Discount'], 
-        df_analysis['Profit']
-    )
-    r_squared = r_value**2
-    
     col1, col2, col3 = st.columns(3)
     col1.metric("R-squared (R²)", f"{r_squared:.3f}")
     col2.metric("P-value", f"{p_value:.3g}")
@@ -67,4 +68,7 @@ if not df_analysis.empty:
     else:
         st.error("**The relationship is not statistically significant (p >= 0.05).**")
 else:
-    st.warning("No data found with discounts greater than 0 for the selected filters.")
\ No newline at end of file
+    st.warning("No data found with discounts greater than 0 for the selected filters.")
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
@@ -2,16 +2,15 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from data_loader import load_data
 import plot_functions as pf
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import r2_score
+import regression as rg
+import instrumentation as instr
+import warmup
 
 st.set_page_config(page_title="Multiple Regression", page_icon="🧮", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 st.title("🧮 Multiple Linear Regression")
 st.markdown("Predicting `Profit` based on `Sales`, `Quantity`, and `Discount`.")
@@ -19,43 +18,39 @@ st.markdown("Predicting `Profit` based on `Sales`, `Quantity`, and `Discount`.")
 # --- Filters ---
 st.sidebar.header("Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
-category_choices = ["All"] + sorted(df['Category'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
+category_choices = pf.filter_choices('Category')[1:]
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-sel_category = st.sidebar.selectbox('Category', options=category_choices)
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
+sel_category = st.sidebar.multiselect('Category', options=category_choices, placeholder="All")
 
 # --- Apply Filters ---
-filtered_df = pf.apply_filters(df, sel_year, sel_region, sel_category, "All")
+# Features and target for the predictions, plus the row key columns behind the CV folds
+filtered_df = pf.filtered_rows(pf.filter_key(sel_year, sel_region, sel_category, "All"),
+                               rg.REG_FEATURES + [rg.REG_TARGET, 'Row ID', 'Order ID'])
 
 if filtered_df.shape[0] < 10:
     st.warning("Not enough data to run a regression model with the current filters. Please select 'All' for all filters.")
 else:
     # --- 1. Prepare Data for Model ---
-    features = ['Sales', 'Quantity', 'Discount']
-    target = 'Profit'
-    
-    X = filtered_df[features]
-    y = filtered_df[target]
-    
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+    features = rg.REG_FEATURES
+    target = rg.REG_TARGET
 
     # --- 2. Run the Algorithm ---
-    model = LinearRegression()
-    model.fit(X_train, y_train)
+    # Fitted from cached per-partition XᵀX / Xᵀy sums (regression.py); R² is the
+    # mean out-of-fold score of a 5-fold cross-validation, not a single split
+    fit = rg.multiple_regression((sel_year, sel_region, sel_category), features)
 
     # --- 3. Evaluate the Model ---
-    y_pred = model.predict(X_test)
-    r_squared = r2_score(y_test, y_pred)
-    coefficients = model.coef_
-    intercept = model.intercept_
+    r_squared = fit['cv_r2']
+    coefficients = list(fit['coef'].values())
+    intercept = fit['intercept']
 
     # --- 4. Display Results ---
     st.subheader("Model Performance")
-    st.metric("Model R-squared (R²)", f"{r_squared:.3f}")
+    st.metric("Model R-squared (R², 5-fold CV)", f"{r_squared:.3f}")
     st.markdown(f"This means our model can explain **{r_squared*100:.1f}%** of the variance in `Profit` using these 3 features.")
     
     st.markdown("---")
@@ -63,14 +58,18 @@ else:
     # --- 5. VISUALIZATION: Actual vs. Predicted ---
     st.subheader("Model Accuracy: Actual Profit vs. Predicted Profit")
     
-    # Create a DataFrame for plotting
-    plot_df = pd.DataFrame({'Actual Profit': y_test, 'Predicted Profit': y_pred})
+    # Create a DataFrame for plotting: out-of-fold predictions for every filtered row
+    y_test = filtered_df[target]
+    fold = rg.row_folds(filtered_df)
+    plot_df = pd.DataFrame({'Actual Profit': y_test, 'Predicted Profit': rg.predict(fit, filtered_df, fold)})
+    # Only a sample (keeping the worst misses) is sent to the browser; R² above uses every row
+    plot_points = pf.downsample_points(plot_df, 'Actual Profit', 'Predicted Profit')
     
     fig = px.scatter(
-        plot_df, 
+        plot_points, 
         x='Actual Profit', 
         y='Predicted Profit', 
-        title='Actual vs. Predicted Profit'
+        title=pf.sampled_title('Actual vs. Predicted Profit', len(plot_points), len(plot_df))
     )
     # Add the "perfect fit" 45-degree line
     fig.add_trace(go.Scatter(
@@ -80,7 +79,7 @@ else:
         name='Perfect Fit',
         line=dict(color='red', dash='dash')
     ))
-    st.plotly_chart(fig, use_container_width=True)
+    instr.plotly_chart(fig, use_container_width=True)
     st.markdown("A perfect model would have all dots on the red 'Perfect Fit' line. This plot shows how well the model predicts profit.")
 
     # --- 6. Display Coefficients ---
@@ -98,4 +97,7 @@ else:
         use_container_width=True
     )
 
-    st.markdown(f"**Full Equation:** `Profit = ({coeff_df.loc['Sales'].values[0]:.2f} * Sales) + ({coeff_df.loc['Quantity'].values[0]:.2f} * Quantity) + ({coeff_df.loc['Discount'].values[0]:.2f} * Discount) + {intercept:.2f}`")
\ No newline at end of file
+    st.markdown(f"**Full Equation:** `Profit = ({coeff_df.loc['Sales'].values[0]:.2f} * Sales) + ({coeff_df.loc['Quantity'].values[0]:.2f} * Quantity) + ({coeff_df.loc['Discount'].values[0]:.2f} * Discount) + {intercept:.2f}`")
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
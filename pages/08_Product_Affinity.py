@@ -1,107 +1,114 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from data_loader import load_data
 import plot_functions as pf
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
+from affinity import load_rules
+import instrumentation as instr
+import grid
+import export
+import deferred
+import warmup
 
 st.set_page_config(page_title="Product Affinity", page_icon="🛒", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 st.title("🛒 Product Affinity (Association Rules)")
 st.markdown("Find which sub-categories are most frequently purchased together in the same order.")
 
 # --- Filters ---
+# Choices and date bounds are cached query-backend lookups; this page keeps no order lines of its own
 st.sidebar.header("Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
-category_choices = ["All"] + sorted(df['Category'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
+category_choices = pf.filter_choices('Category')[1:]
+date_min, date_max = pf.date_limits()
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-sel_category = st.sidebar.selectbox('Category', options=category_choices)
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
+sel_category = st.sidebar.multiselect('Category', options=category_choices, placeholder="All")
+sel_dates = st.sidebar.date_input('Order Date range', value=(), min_value=date_min, max_value=date_max)
 
 # --- Apply Filters ---
-filtered_df = pf.apply_filters(df, sel_year, sel_region, sel_category, "All")
+flt = pf.filter_key(sel_year, sel_region, sel_category, "All", sel_dates)
 
-# --- Apriori Algorithm ---
+# --- Association Rules (Eclat) ---
 st.subheader("Association Rules Model")
 
-# 1. Prepare the "basket"
-basket = filtered_df.groupby('Order ID')['Sub-Category'].apply(list).values.tolist()
+def show_rules(result):
+    n_baskets, rules = result
+    if n_baskets == 0:
+        st.warning("No orders found for the selected filters.")
+        return
+    if rules.empty:
+        st.warning("No significant product associations found for the current filters (min_support=1%).")
+    else:
+        
+        # --- 5. FIX: Convert frozensets to strings for plotting ---
+        # We create new columns for the hover data
+        rules['antecedents_str'] = rules['antecedents'].apply(lambda x: ', '.join(list(x)))
+        rules['consequents_str'] = rules['consequents'].apply(lambda x: ', '.join(list(x)))
+        # --- END OF FIX ---
 
-if not basket:
-    st.warning("No orders found for the selected filters.")
-else:
-    # 2. One-hot encode the data
-    te = TransactionEncoder()
-    te_ary = te.fit(basket).transform(basket)
-    df_basket = pd.DataFrame(te_ary, columns=te.columns_)
+        st.subheader("Rule Visualization (Support vs. Confidence)")
+        # At most pf.MAX_SCATTER_POINTS rules are plotted; the most extreme ones are always kept
+        points = pf.downsample_points(rules, 'support', 'confidence')
+        if len(points) < len(rules):
+            st.caption(f"Showing {len(points):,} of {len(rules):,} rules.")
+        fig = px.scatter(
+            points,
+            x="support",
+            y="confidence",
+            color="lift",
+            size="lift",
+            # Use the new string columns for hover data
+            hover_data=['antecedents_str', 'consequents_str'], 
+            color_continuous_scale="Viridis",
+            title="Association Rule Strength (Support vs. Confidence)"
+        )
+        fig.update_layout(
+            xaxis_title="Support (Frequency)",
+            yaxis_title="Confidence (Reliability)"
+        )
+        instr.plotly_chart(fig, use_container_width=True)
 
-    # 3. Run the Apriori algorithm
-    try:
-        frequent_itemsets = apriori(df_basket, min_support=0.01, use_colnames=True)
+        # Display the rules table
+        st.subheader("Top Association Rules (Table)")
         
-        # 4. Find the association rules
-        rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1)
+        # Use the same string columns for the table display
+        rules_display = rules[['antecedents_str', 'consequents_str', 'support', 'confidence', 'lift']]
+        rules_display = rules_display.rename(columns={
+            'antecedents_str': 'antecedents',
+            'consequents_str': 'consequents'
+        })
+
+        # Searched, sorted and paged on the server; only the visible window is sent
+        grid.paged_grid(
+            rules_display, key="rules", sort_by='confidence', descending=True,
+            column_config={'support': st.column_config.NumberColumn(format="percent"),
+                           'confidence': st.column_config.NumberColumn(format="percent"),
+                           'lift': st.column_config.NumberColumn(format="%.2f")}
+        )
         
-        rules = rules.sort_values(by='confidence', ascending=False)
+        with st.expander("Export all rules"):
+            export.export_panel(rules_display, "association_rules", key="rules_export", token=('rules', flt))
         
-        if rules.empty:
-            st.warning("No significant product associations found for the current filters (min_support=1%).")
-        else:
-            
-            # --- 5. FIX: Convert frozensets to strings for plotting ---
-            # We create new columns for the hover data
-            rules['antecedents_str'] = rules['antecedents'].apply(lambda x: ', '.join(list(x)))
-            rules['consequents_str'] = rules['consequents'].apply(lambda x: ', '.join(list(x)))
-            # --- END OF FIX ---
-
-            st.subheader("Rule Visualization (Support vs. Confidence)")
-            fig = px.scatter(
-                rules,
-                x="support",
-                y="confidence",
-                color="lift",
-                size="lift",
-                # Use the new string columns for hover data
-                hover_data=['antecedents_str', 'consequents_str'], 
-                color_continuous_scale="Viridis",
-                title="Association Rule Strength (Support vs. Confidence)"
-            )
-            fig.update_layout(
-                xaxis_title="Support (Frequency)",
-                yaxis_title="Confidence (Reliability)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        st.markdown("""
+        **How to Read This Table:**
+        * **antecedents:** The product(s) a client has (IF...).
+        * **consequents:** The product(s) the client is likely to buy (...THEN).
+        * **confidence:** "If a client buys the antecedent, what is the % chance they also buy the consequent?"
+        * **lift:** How much *more* likely are these to be bought together than by random chance? (A score > 1 is good).
+        """)
 
-            # Display the rules table
-            st.subheader("Top Association Rules (Table)")
-            
-            # Use the same string columns for the table display
-            rules_display = rules[['antecedents_str', 'consequents_str', 'support', 'confidence', 'lift']]
-            rules_display = rules_display.rename(columns={
-                'antecedents_str': 'antecedents',
-                'consequents_str': 'consequents'
-            })
+def rules_failed(e):
+    st.error(f"An error occurred during the association rule calculation. The filtered dataset may be too small or sparse. Error: {e}")
 
-            st.dataframe(
-                rules_display.style
-                .format({'support': '{:.2%}', 'confidence': '{:.2%}', 'lift': '{:.2f}'}),
-                use_container_width=True
-            )
-            
-            st.markdown("""
-            **How to Read This Table:**
-            * **antecedents:** The product(s) a client has (IF...).
-            * **consequents:** The product(s) the client is likely to buy (...THEN).
-            * **confidence:** "If a client buys the antecedent, what is the % chance they also buy the consequent?"
-            * **lift:** How much *more* likely are these to be bought together than by random chance? (A score > 1 is good).
-            """)
+# 1-4. Baskets as packed bitsets, frequent itemsets and rules (cached per filter state),
+# computed off the script thread while the page shell renders
+deferred.render_all([deferred.Section(lambda: load_rules(flt, min_support=0.01), show_rules, rules_failed,
+                                      message="Mining association rules…")])
 
-    except Exception as e:
-        st.error(f"An error occurred during the Apriori calculation. The filtered dataset may be too small or sparse. Error: {e}")
\ No newline at end of file
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
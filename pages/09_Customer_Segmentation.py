@@ -1,55 +1,50 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from data_loader import load_data
-import plot_functions as pf
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from plotly.subplots import make_subplots
+import plotly.graph_objects as go
+from segmentation import load_segmentation, FEATURES
+import instrumentation as instr
+import deferred
+import warmup
 
 st.set_page_config(page_title="Customer Segmentation", page_icon="🤖", layout="wide")
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 st.title("🤖 Customer Segmentation (K-Means Clustering)")
 st.markdown("Automatically find hidden customer groups based on their total sales and profit.")
 
-# --- 1. Prepare Data for Clustering ---
-df_customer = df.groupby('Customer Name').agg({
-    'Sales': 'sum',
-    'Profit': 'sum',
-    'Order ID': 'nunique'
-}).reset_index()
+# --- 1. User Controls ---
+st.sidebar.header("Clustering Controls")
+k = st.sidebar.slider(
+    "Select Number of Clusters (K)",
+    min_value=2, 
+    max_value=8, 
+    value=4, 
+    step=1
+)
 
-df_customer = df_customer.rename(columns={'Order ID': 'Total Orders'})
+# --- 2. Customer Features, Scaling and Fits ---
+# Features come from the shared per-Customer ID metrics (customer_metrics.py); they,
+# the scaler and one fitted model per K are computed once per dataset and
+# cached, so moving the K slider (or any other rerun) does not refit anything. On a
+# cold cache the fit runs off the script thread while the page shell renders.
+def show_segments(seg):
+    df_customer = seg.features.copy()
+    if df_customer.shape[0] < 10:
+        st.warning("Not enough customer data to perform clustering.")
+        return
+    features = FEATURES
+    scaler = seg.scaler
 
-if df_customer.shape[0] < 10:
-    st.warning("Not enough customer data to perform clustering.")
-else:
-    # --- 2. Normalize Data ---
-    features = ['Sales', 'Profit', 'Total Orders']
-    X = df_customer[features]
-    
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    # --- 3. User Controls ---
-    st.sidebar.header("Clustering Controls")
-    k = st.sidebar.slider(
-        "Select Number of Clusters (K)",
-        min_value=2, 
-        max_value=8, 
-        value=4, 
-        step=1
-    )
-
-    # --- 4. Run the Algorithm ---
-    kmeans = KMeans(n_clusters=k, init='k-means++', n_init=10, random_state=42)
-    kmeans.fit(X_scaled)
+    # --- 3. Pick the Fitted Model ---
+    kmeans = seg.models[k]
     
     df_customer['Cluster'] = kmeans.labels_.astype(str) 
 
-    # --- 5. Visualize the Clusters ---
+    # --- 4. Visualize the Clusters ---
     st.subheader(f"Customer Segments (K={k})")
     
     fig = px.scatter(
@@ -59,13 +54,14 @@ else:
         color="Cluster",
         size="Total Orders",
         hover_name="Customer Name",
-        hover_data={"Sales": ":.2f", "Profit": ":.2f", "Total Orders": True, "Cluster": True},
+        hover_data={"Customer ID": True, "Sales": ":.2f", "Profit": ":.2f", "Total Orders": True,
+                    "Recency": True, "CLV": ":.2f", "RFM Score": True, "Cluster": True},
         title="Customer Segments (Sales vs. Profit)"
     )
     fig.update_layout(xaxis_title="Total Sales ($)", yaxis_title="Total Profit ($)")
-    st.plotly_chart(fig, use_container_width=True)
+    instr.plotly_chart(fig, use_container_width=True)
 
-    # --- 6. Analyze Cluster Centers ---
+    # --- 5. Analyze Cluster Centers ---
     st.subheader("Cluster Profiles")
     st.markdown("This table shows the 'average' customer in each segment. (Values are in their original scale.)")
     
@@ -81,9 +77,22 @@ else:
         use_container_width=True
     )
     
+    # --- 6. Choosing K ---
+    st.subheader("Choosing K (Elbow & Silhouette)")
+    fig_k = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_k.add_trace(go.Scatter(x=seg.sweep['K'], y=seg.sweep['Inertia'], name='Inertia', mode='lines+markers'), secondary_y=False)
+    fig_k.add_trace(go.Scatter(x=seg.sweep['K'], y=seg.sweep['Silhouette'], name='Silhouette', mode='lines+markers'), secondary_y=True)
+    fig_k.update_layout(title_text=f"K-Means Sweep ({'Mini-batch' if seg.mode == 'minibatch' else 'Full'} K-Means)", xaxis_title="K")
+    instr.plotly_chart(fig_k, use_container_width=True)
+
     st.markdown("""
     **How to Read This:**
     * Look for the segment with high `Sales` and high `Profit` (your **Ideal Customers**).
     * Look for the segment with high `Sales` but low/negative `Profit` (your **Unprofitable Customers**).
     * Look for the segment with low `Sales` and low `Profit` (your **Occasional Customers**).
-    """)
\ No newline at end of file
+    """)
+
+deferred.render_all([deferred.Section(load_segmentation, show_segments, message="Clustering customers…")])
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
@@ -1,7 +1,11 @@
 import streamlit as st
+import warmup
 
 st.set_page_config(page_title="About", page_icon="ℹ️", layout="centered")
 
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
+
 st.title("ℹ️ About This Dashboard")
 
 st.markdown("""
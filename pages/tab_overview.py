@@ -1,6 +1,7 @@
 import streamlit as st
-from data_loader import load_data
 import plot_functions as pf # pf = plot_functions
+import instrumentation as instr
+import warmup
 
 # Set page config (must be the first Streamlit command)
 st.set_page_config(
@@ -9,30 +10,34 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load data
-df = load_data()
+# Precompute every page's default view in the background (once per process)
+warmup.start_background()
 
 # --- Page Title ---
 st.title("🚀 Superstore BI Dashboard: Overview")
 
 # --- Filters ---
+# Choices and date bounds are cached query-backend lookups; this page keeps no order lines of its own
 st.sidebar.header("Dashboard Filters")
 
-year_choices = ["All"] + sorted(df['Order Year'].unique())
-region_choices = ["All"] + sorted(df['Region'].unique())
-category_choices = ["All"] + sorted(df['Category'].unique())
-segment_choices = ["All"] + sorted(df['Segment'].unique())
+year_choices = pf.filter_choices('Order Year')[1:]
+region_choices = pf.filter_choices('Region')[1:]
+category_choices = pf.filter_choices('Category')[1:]
+segment_choices = pf.filter_choices('Segment')[1:]
+date_min, date_max = pf.date_limits()
 
-sel_year = st.sidebar.selectbox('Year', options=year_choices)
-sel_region = st.sidebar.selectbox('Region', options=region_choices)
-sel_category = st.sidebar.selectbox('Category', options=category_choices)
-sel_segment = st.sidebar.selectbox('Segment', options=segment_choices)
+sel_year = st.sidebar.multiselect('Year', options=year_choices, placeholder="All")
+sel_region = st.sidebar.multiselect('Region', options=region_choices, placeholder="All")
+sel_category = st.sidebar.multiselect('Category', options=category_choices, placeholder="All")
+sel_segment = st.sidebar.multiselect('Segment', options=segment_choices, placeholder="All")
+sel_dates = st.sidebar.date_input('Order Date range', value=(), min_value=date_min, max_value=date_max)
 
 # --- Apply Filters ---
-filtered_df = pf.apply_filters(df, sel_year, sel_region, sel_category, sel_segment)
+# The overview is served from the shared aggregate cache, so no filtered copy is needed
+flt = pf.filter_key(sel_year, sel_region, sel_category, sel_segment, sel_dates)
 
 # --- KPIs ---
-kpis = pf.compute_kpis(filtered_df)
+kpis = pf.compute_kpis(filters=flt)
 
 col1, col2, col3, col4 = st.columns(4)
 col1.metric("Total Sales", f"${kpis['total_sales']:,.2f}")
@@ -45,8 +50,11 @@ st.markdown("---")
 # --- Charts ---
 col1, col2 = st.columns(2)
 with col1:
-    st.plotly_chart(pf.fig_yearly_overview(filtered_df), use_container_width=True)
+    instr.plotly_chart(pf.fig_yearly_overview(filters=flt), use_container_width=True)
 with col2:
-    st.plotly_chart(pf.fig_monthly_sales(filtered_df), use_container_width=True)
+    instr.plotly_chart(pf.fig_monthly_sales(filters=flt), use_container_width=True)
 
-st.plotly_chart(pf.fig_sales_by_region(filtered_df), use_container_width=True)
\ No newline at end of file
+instr.plotly_chart(pf.fig_sales_by_region(filters=flt), use_container_width=True)
+
+# Profiling panel (only with SUPERSTORE_PROFILE=1)
+instr.debug_panel()
@@ -1,55 +1,208 @@
+import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-
-try:
-    from statsmodels.tsa.holtwinters import ExponentialSmoothing
-    _HAS_STATS = True
-except:
-    _HAS_STATS = False
+from data_loader import dataset_version, DATA_PATH
+import forecasting as fc
+from backends import get_backend, selection, date_span
+import instrumentation as instr
+from geo import load_geo_store, GEO_LEVELS
+from customer_metrics import CustomerMetrics, customer_table
 
 # ---------------- KPI & Filter Logic ----------------
-def compute_kpis(filtered_df):
+@instr.traced()
+def compute_kpis(filtered_df=None, filters=None):
+    if filters is not None:
+        with instr.span("base_aggregate", cached=True):
+            return _base_aggregate(filters, DATA_PATH, dataset_version())[1]
     total_sales = float(filtered_df['Sales'].sum())
     total_profit = float(filtered_df['Profit'].sum())
     avg_discount = float(filtered_df['Discount'].mean()) if len(filtered_df) else 0.0
     total_orders = int(filtered_df['Order ID'].nunique())
     return {"total_sales": total_sales,"total_profit": total_profit,"avg_discount": avg_discount,"total_orders": total_orders}
 
-# We pass the main DF here to avoid using a global
-def apply_filters(df, year, region, category, segment):
-    d = df.copy()
-    if year != "All": d = d[d['Order Year']==int(year)]
-    if region != "All": d = d[d['Region']==region]
-    if category != "All": d = d[d['Category']==category]
-    if segment != "All": d = d[d['Segment']==segment]
-    return d
+def filter_key(year, region, category, segment, dates=None):
+    # Hashable, normalised filter state used as the shared aggregate cache key:
+    # (year, region, category, segment, order date range), each "All", a value or a
+    # sorted tuple of values (multi-select); the range is (first day, last day)
+    return tuple(selection(year, region, category, segment, dates).values())
+
+# We pass the main DF here to avoid using a global.
+# With a FilterIndex (data_loader.load_filter_index) the matching rows come from the
+# precomputed posting lists and are gathered in one take; unfiltered calls return
+# the frame itself. Callers must treat the result as read-only.
+@instr.traced()
+def apply_filters(df, year, region, category, segment, dates=None, index=None):
+    sel = selection(year, region, category, segment, dates)
+    if index is not None:
+        rows = index.rows(sel)
+        return df if rows is None else df.take(rows)
+    mask = np.ones(len(df), dtype=bool)
+    for col, value in sel.items():
+        if value == "All": continue
+        if col == 'Order Date':
+            start, end = date_span(value)
+            mask &= ((df[col] >= start) & (df[col] < end)).to_numpy()
+        elif isinstance(value, tuple): mask &= df[col].isin(value).to_numpy()
+        else: mask &= (df[col] == value).to_numpy()
+    return df if mask.all() else df[mask]
+
+@st.cache_data(max_entries=32)
+def _filtered_rows(filters, columns, discounted, limit, path, version):
+    instr.cache_miss()
+    return get_backend(path).rows(filters, path, columns, discounted, limit)
+
+@instr.traced(cached=True)
+def filtered_rows(filters, columns=None, discounted=False, limit=None, path=DATA_PATH):
+    # The `columns` of the order lines matching a filter key (filter_key), only those with
+    # Discount > 0 if discounted, at most `limit` of them, from the query backend: a
+    # FilterIndex take of the shared frame with pandas, a pushed-down scan of the snapshot
+    # with DuckDB. Cached per filter state, so reruns with unchanged filters skip the read;
+    # all columns (columns=None) only with a limit, full row sets come from order_lines.
+    columns = None if columns is None else tuple(columns)
+    return _filtered_rows(filters, columns, discounted, limit, path, dataset_version(path))
+
+@instr.traced()
+def order_lines(filters, path=DATA_PATH):
+    # Every column of the matching order lines, uncached: only built when an export is clicked
+    return get_backend(path).rows(filters, path)
+
+# ---------------- Shared Aggregates ----------------
+# Figure builders given `filters=filter_key(...)` read from these caches instead of
+# grouping the filtered frame themselves. One grouped pass at BASE_GRAIN per filter
+# state serves every builder below; st.cache_data shares it across sessions. The
+# passes themselves run on the configured query backend (backends.py).
+BASE_GRAIN = ['Order Month Sort', 'Order Year', 'Region', 'Category', 'State', 'State_Code']
+
+@st.cache_data(max_entries=512)
+def _base_aggregate(filters, path, version):
+    instr.cache_miss()
+    backend = get_backend(path)
+    base = backend.aggregate(filters, BASE_GRAIN, path)
+    rows = int(base['Rows'].sum())
+    kpis = {"total_sales": float(base['Sales'].sum()), "total_profit": float(base['Profit'].sum()),
+            "avg_discount": float(base['Discount Sum'].sum() / rows) if rows else 0.0,
+            "total_orders": backend.order_count(filters, path)}
+    return base, kpis
+
+@st.cache_data(max_entries=2048)
+def _rollup(filters, grain, path, version):
+    instr.cache_miss()
+    grain = list(grain)
+    if set(grain) <= set(BASE_GRAIN):
+        base = _base_aggregate(filters, path, version)[0]
+    else:
+        base = get_backend(path).aggregate(filters, grain, path)
+    return base.groupby(grain, as_index=False, observed=True)[['Sales', 'Profit', 'Rows']].sum()
+
+@instr.traced(cached=True)
+def rollup(filters, grain, path=DATA_PATH):
+    # Sales/Profit/row totals for `filters` grouped by `grain` (a tuple of column names).
+    # Grains finer than BASE_GRAIN (e.g. customers) take their own single pass.
+    return _rollup(filters, tuple(grain), path, dataset_version(path))
+
+@st.cache_data(max_entries=64)
+def _filter_choices(column, path, version):
+    return get_backend(path).distinct(column, path)
+
+def filter_choices(column, path=DATA_PATH):
+    # ["All"] + the distinct values of a filter column, answered by the query backend
+    return ["All"] + list(_filter_choices(column, path, dataset_version(path)))
+
+@st.cache_data(max_entries=8)
+def _date_limits(path, version):
+    lo, hi = get_backend(path).bounds('Order Date', path)
+    return pd.Timestamp(lo).date(), pd.Timestamp(hi).date()
+
+def date_limits(path=DATA_PATH):
+    # (first, last) order date, for the bounds of the date range picker
+    return _date_limits(path, dataset_version(path))
+
+def _grouped(filtered_df, filters, grain, values):
+    if filters is not None: return rollup(filters, tuple(grain))
+    return filtered_df.groupby(list(grain), as_index=False, observed=True).agg({v: 'sum' for v in values})
+
+# ---------------- Scatter Downsampling ----------------
+# Scatter charts ship at most MAX_SCATTER_POINTS points to the browser. Statistics
+# (regression lines, KPIs) are always computed on the full data by the caller.
+MAX_SCATTER_POINTS = 5000
+# Heatmaps print their cell values only up to this many cells; past it the labels are
+# unreadable and dominate the figure payload
+HEATMAP_TEXT_CELLS = 400
+
+def _robust_z(v):
+    med = np.median(v)
+    scale = 1.4826 * np.median(np.abs(v - med)) or v.std() or 1.0
+    return (v - med) / scale
+
+@instr.traced()
+def downsample_points(df, x, y, max_points=None, strata=None, outlier_frac=0.1, seed=42):
+    # Keeps the outlier_frac most extreme points (robust z-distance in x/y) so tails stay
+    # visible, then a random sample of the rest allocated proportionally per stratum.
+    max_points = max_points or MAX_SCATTER_POINTS
+    if len(df) <= max_points: return df
+    score = np.hypot(_robust_z(df[x].to_numpy(float)), _robust_z(df[y].to_numpy(float)))
+    n_out = int(max_points * outlier_frac)
+    outliers = np.argpartition(-score, n_out)[:n_out]
+    rest = np.ones(len(df), dtype=bool)
+    rest[outliers] = False
+    rest = np.flatnonzero(rest)
+    rng = np.random.default_rng(seed)
+    budget = max_points - n_out
+    if strata is None:
+        sampled = rng.choice(rest, budget, replace=False)
+    else:
+        codes = pd.factorize(df[strata].to_numpy()[rest])[0]
+        quota = np.maximum(1, np.round(budget * np.bincount(codes) / len(rest))).astype(int)
+        order = np.lexsort((rng.random(len(rest)), codes))
+        rank = np.arange(len(rest)) - np.searchsorted(codes[order], codes[order])
+        sampled = rest[order[rank < quota[codes[order]]]]
+    return df.iloc[np.sort(np.concatenate([outliers, sampled]))]
+
+def sampled_title(title, shown, total):
+    return title if shown == total else f'{title} (showing {shown:,} of {total:,} points)'
+
+@instr.traced()
+def fig_density(df, x, y, title, bins=60):
+    # Binned on the server: the browser receives a bins x bins grid, not the points
+    counts, xe, ye = np.histogram2d(df[x].to_numpy(float), df[y].to_numpy(float), bins=bins)
+    fig = go.Figure(go.Heatmap(x=(xe[:-1] + xe[1:]) / 2, y=(ye[:-1] + ye[1:]) / 2, z=np.where(counts.T > 0, counts.T, np.nan),
+                               colorscale='Viridis', colorbar=dict(title='Rows')))
+    fig.update_layout(title_text=title, xaxis_title=x, yaxis_title=y)
+    return fig
 
 # ---------------- Plotly Charts ----------------
-def fig_monthly_sales(filtered_df):
-    if filtered_df.empty: return px.bar(title='No data')
-    monthly = filtered_df.groupby('Order Month Sort', as_index=False).agg({'Sales':'sum'}).sort_values('Order Month Sort')
+@instr.traced()
+def fig_monthly_sales(filtered_df=None, filters=None):
+    monthly = _grouped(filtered_df, filters, ['Order Month Sort'], ['Sales']).sort_values('Order Month Sort')
+    if monthly.empty: return px.bar(title='No data')
     fig = px.bar(monthly, x='Order Month Sort', y='Sales', title='Monthly Sales')
     fig.add_trace(go.Scatter(x=monthly['Order Month Sort'], y=monthly['Sales'], mode='lines+markers', name='Trend'))
     return fig
 
-def fig_yearly_overview(filtered_df):
-    yearly = filtered_df.groupby('Order Year', as_index=False).agg({'Sales':'sum','Profit':'sum'}).sort_values('Order Year')
+@instr.traced()
+def fig_yearly_overview(filtered_df=None, filters=None):
+    yearly = _grouped(filtered_df, filters, ['Order Year'], ['Sales', 'Profit']).sort_values('Order Year')
     fig = make_subplots(specs=[[{"secondary_y": True}]] )
     fig.add_trace(go.Bar(x=yearly['Order Year'], y=yearly['Sales'], name='Sales'), secondary_y=False)
     fig.add_trace(go.Scatter(x=yearly['Order Year'], y=yearly['Profit'], name='Profit', mode='lines+markers'), secondary_y=True)
     fig.update_layout(title_text='Sales & Profit by Year')
     return fig
 
-def fig_profit_vs_sales(filtered_df):
+@instr.traced()
+def fig_profit_vs_sales(filtered_df, max_points=None, mode='sample'):
     if filtered_df.empty: return px.scatter(title='No data')
-    return px.scatter(filtered_df, x='Sales', y='Profit', color='Region', hover_data=['Order ID','Customer Name','Sub-Category'], title='Profit vs Sales')
+    if mode == 'density': return fig_density(filtered_df, 'Sales', 'Profit', 'Profit vs Sales (density)')
+    pts = downsample_points(filtered_df, 'Sales', 'Profit', max_points, strata='Region')
+    return px.scatter(pts, x='Sales', y='Profit', color='Region', hover_data=[c for c in ['Order ID','Customer Name','Sub-Category'] if c in pts.columns],
+                      title=sampled_title('Profit vs Sales', len(pts), len(filtered_df)))
 
-def fig_profit_by_category(filtered_df):
-    if filtered_df.empty: return px.bar(title='No data')
-    cat = filtered_df.groupby('Category', as_index=False).agg({'Profit':'sum','Sales':'sum'})
+@instr.traced()
+def fig_profit_by_category(filtered_df=None, filters=None):
+    cat = _grouped(filtered_df, filters, ['Category'], ['Profit', 'Sales'])
+    if cat.empty: return px.bar(title='No data')
     cat['Profit Margin %'] = 100*cat['Profit']/cat['Sales'].replace(0,np.nan)
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fig.add_trace(go.Bar(x=cat['Category'], y=cat['Profit'], name='Profit'), secondary_y=False)
@@ -57,24 +210,48 @@ def fig_profit_by_category(filtered_df):
     fig.update_layout(title_text='Profit & Margin by Category')
     return fig
 
-def fig_sales_by_state(filtered_df):
-    if filtered_df.empty: return px.choropleth(title='No data')
-    state_agg = filtered_df.groupby(['State', 'State_Code']).agg({'Profit': 'sum'}).reset_index()
+@instr.traced()
+def fig_sales_by_state(filtered_df=None, filters=None):
+    if filters is not None and filters[3] == "All" and filters[4] == "All":
+        # Year x Region x Category lookups come straight from the geo store
+        state_agg = load_geo_store().query('State', *filters[:3])
+    else:
+        state_agg = _grouped(filtered_df, filters, ['State', 'State_Code'], ['Profit'])
+    if state_agg.empty: return px.choropleth(title='No data')
     return px.choropleth(state_agg, locations='State_Code', locationmode='USA-states', color='Profit',
                          scope='usa', hover_name='State', color_continuous_scale='RdYlGn',
                          title='Profit by State (USA)')
 
-def fig_sales_by_region(filtered_df):
-    if filtered_df.empty: return px.treemap(title='No data')
-    s = filtered_df.groupby('Region', as_index=False).agg({'Sales':'sum'})
+@instr.traced()
+def fig_geo_drilldown(filters, level='City', state=None, top_n=25):
+    # Top cities / postal codes by profit, optionally within one state
+    if filters[3] == "All" and filters[4] == "All":
+        geo = load_geo_store().query(level, *filters[:3], state=state)
+    else:
+        # The geo store is not broken down by Segment or date: roll up the matching rows instead
+        geo = rollup(filters, GEO_LEVELS[level])
+        if state is not None: geo = geo[geo['State'] == state]
+    if geo.empty: return px.bar(title='No data')
+    geo = geo.sort_values('Profit', ascending=False).head(top_n)
+    label = geo['City'].astype(str) if level == 'City' else geo['City'].astype(str) + ' ' + geo['Postal Code'].astype(str)
+    where = f' in {state}' if state else ''
+    return px.bar(geo.assign(Location=label), x='Location', y='Profit', hover_data=['State', 'Sales', 'Rows'],
+                  title=f'Top {top_n} {level}s by Profit{where}')
+
+@instr.traced()
+def fig_sales_by_region(filtered_df=None, filters=None):
+    s = _grouped(filtered_df, filters, ['Region'], ['Sales'])
+    if s.empty: return px.treemap(title='No data')
     return px.treemap(s, path=['Region'], values='Sales', title='Sales by Region')
 
-def fig_forecast(filtered_df, periods=6):
-    monthly = filtered_df.groupby('Order Month Sort', as_index=False).agg({'Sales':'sum'}).set_index('Order Month Sort').asfreq('MS').fillna(0)
-    if _HAS_STATS and len(monthly)>=6:
+@instr.traced()
+def fig_forecast(filtered_df=None, periods=6, filters=None):
+    monthly = _grouped(filtered_df, filters, ['Order Month Sort'], ['Sales'])[['Order Month Sort', 'Sales']]
+    monthly = monthly.set_index('Order Month Sort').sort_index().asfreq('MS').fillna(0)
+    if fc.can_forecast(monthly):
         try:
-            model = ExponentialSmoothing(monthly['Sales'], seasonal='add', seasonal_periods=12)
-            fit = model.fit(optimized=True)
+            # With a filter key the fitted model is cached and reused for every horizon
+            fit = fc.fitted_model(filters, monthly['Sales']) if filters is not None else fc.fit_holt_winters(monthly['Sales'])
             fcast = fit.forecast(periods)
             fig = go.Figure()
             fig.add_trace(go.Scatter(x=monthly.index, y=monthly['Sales'], mode='lines+markers', name='Actual'))
@@ -83,19 +260,83 @@ def fig_forecast(filtered_df, periods=6):
         except: return px.line(monthly, y='Sales', title='Forecast failed')
     return px.line(monthly, y='Sales', title='Actual Sales')
 
-def fig_top_customers(filtered_df, top_n=10):
-    if filtered_df.empty: return px.bar(title='No data')
-    cust = filtered_df.groupby('Customer Name', as_index=False).agg({'Profit':'sum'}).sort_values('Profit', ascending=False).head(top_n)
-    return px.bar(cust, x='Customer Name', y='Profit', title=f'Top {top_n} Customers by Profit')
+@instr.traced()
+def fig_top_customers(filtered_df=None, top_n=10, filters=None):
+    # Per Customer ID from the shared customer metrics; names shared by several
+    # customers in the chart get their ID appended so their bars stay apart
+    cust = customer_table(filters) if filters is not None else CustomerMetrics(filtered_df).table
+    if cust.empty: return px.bar(title='No data')
+    cust = cust.nlargest(top_n, 'Profit')
+    label = cust['Customer Name'].where(~cust['Customer Name'].duplicated(keep=False),
+                                        cust['Customer Name'] + ' (' + cust['Customer ID'] + ')')
+    return px.bar(cust.assign(Customer=label), x='Customer', y='Profit',
+                  hover_data=['Customer ID', 'Total Orders', 'Recency', 'CLV'], title=f'Top {top_n} Customers by Profit')
+
+# ---------------- Acquisition Cohorts ----------------
+# Customers are grouped by the month of their first order (within the filtered data)
+# and followed by months since acquisition, so the matrix is months x months no matter
+# how many customers there are. Built from integer codes, never a customer x month pivot.
+def _cohort_codes(filtered_df):
+    cust, customers = pd.factorize(filtered_df['Customer ID'])
+    dates = filtered_df['Order Date']
+    month = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+    first = np.full(len(customers), month.max(), dtype=month.dtype)
+    np.minimum.at(first, cust, month)
+    return cust, customers, month, first
+
+def _month_label(m):
+    return f"{m // 12}-{m % 12 + 1:02d}"
+
+def _label_month(label):
+    # Inverse of _month_label: "YYYY-MM" -> months since year 0
+    year, month = str(label).split('-')
+    return int(year) * 12 + int(month) - 1
+
+@instr.traced()
+def cohort_retention(filtered_df):
+    # Share of each acquisition cohort with at least one order N months later;
+    # NaN where that month lies past the end of the data.
+    cust, customers, month, first = _cohort_codes(filtered_df)
+    start, span = first.min(), month.max() - first.min() + 1
+    active = np.unique(cust.astype(np.int64) * span + (month - first[cust]))
+    c, offset = active // span, active % span
+    counts = np.zeros((span, span))
+    np.add.at(counts, (first[c] - start, offset), 1)
+    sizes = np.bincount(first - start, minlength=span)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retention = counts / sizes[:, None]
+    observable = np.arange(span)[None, :] < (span - np.arange(span))[:, None]
+    retention = np.where(observable & (sizes[:, None] > 0), retention, np.nan)
+    keep = sizes > 0
+    return pd.DataFrame(retention[keep], index=[_month_label(start + i) for i in np.flatnonzero(keep)],
+                        columns=range(span)).rename_axis(index='Acquisition Month', columns='Months Since Acquisition')
+
+@instr.traced()
+def cohort_customers(filtered_df, cohort, page=0, page_size=50):
+    # One page of a cohort's customers: orders per month since acquisition.
+    # Returns (table, number of pages); pages past the end show the last page.
+    cust, customers, month, first = _cohort_codes(filtered_df)
+    members = np.flatnonzero(first == _label_month(cohort))
+    members = members[np.argsort(np.asarray(customers)[members])]
+    n_pages = max(1, -(-len(members) // page_size))
+    page = min(page, n_pages - 1)
+    members = members[page * page_size:(page + 1) * page_size]
+    rows = np.isin(cust, members)
+    orders = pd.DataFrame({'Customer ID': np.asarray(customers)[cust[rows]],
+                           'Months Since Acquisition': month[rows] - first[cust[rows]],
+                           'Order ID': filtered_df['Order ID'].to_numpy()[rows]})
+    table = orders.groupby(['Customer ID', 'Months Since Acquisition'], observed=True)['Order ID'].nunique().unstack(fill_value=0)
+    return table, n_pages
 
+@instr.traced()
 def fig_cohort_analysis(filtered_df):
     if filtered_df.empty: return px.imshow([[0]], title='No data')
-    df_cohort = filtered_df.groupby(['Customer ID', filtered_df['Order Date'].dt.to_period('M')]).size().reset_index(name='Orders')
-    cohort_pivot = df_cohort.pivot(index='Customer ID', columns='Order Date', values='Orders').fillna(0)
-    cohort_pivot.columns = cohort_pivot.columns.astype(str)
-    fig = px.imshow(cohort_pivot, color_continuous_scale='Viridis', text_auto=True, title='Cohort Analysis: Orders per Customer per Month')
+    retention = cohort_retention(filtered_df)
+    fig = px.imshow(retention, color_continuous_scale='Viridis', text_auto='.0%' if retention.size <= HEATMAP_TEXT_CELLS else False,
+                    aspect='auto', title='Cohort Analysis: Customer Retention by Acquisition Month')
     return fig
 
+@instr.traced()
 def fig_funnel_analysis(filtered_df):
     if filtered_df.empty: return px.funnel(title='No data')
     stages = ['Orders Placed','Items Shipped','Total Profit']
@@ -105,8 +346,9 @@ def fig_funnel_analysis(filtered_df):
     fig = go.Figure(go.Funnel(y=stages, x=[orders, shipped, profit_stage], textinfo="value+percent initial"))
     return fig
 
+@instr.traced()
 def fig_discount_heatmap(filtered_df):
     if filtered_df.empty: return px.imshow([[0]], title='No data')
-    pivot = pd.pivot_table(filtered_df, index='Discount', columns='Category', values='Profit', aggfunc='sum', fill_value=0)
-    fig = px.imshow(pivot, color_continuous_scale='RdYlGn', text_auto=True, title='Discount vs Profit Heatmap')
+    pivot = pd.pivot_table(filtered_df, index='Discount', columns='Category', values='Profit', aggfunc='sum', fill_value=0, observed=True)
+    fig = px.imshow(pivot, color_continuous_scale='RdYlGn', text_auto=pivot.size <= HEATMAP_TEXT_CELLS, title='Discount vs Profit Heatmap')
     return fig
\ No newline at end of file
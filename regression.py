@@ -0,0 +1,163 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import data_loader as dl
+from data_loader import dataset_version, DATA_PATH
+import instrumentation as instr
+from backends import get_backend, selection, ALL_ROWS
+
+REG_FEATURES = ['Sales', 'Quantity', 'Discount']
+REG_TARGET = 'Profit'
+# Page filters the statistics are partitioned by
+REG_KEYS = ['Order Year', 'Region', 'Category']
+N_FOLDS = 5
+# Order-line columns the statistics are built from (Row ID / Order ID fix each line's fold)
+REG_COLUMNS = list(dict.fromkeys(REG_KEYS + REG_FEATURES + [REG_TARGET, 'Row ID', 'Order ID']))
+
+# ---------------- Sufficient Statistics ----------------
+# OLS only needs ZᵀZ for Z = [1, features..., target]: XᵀX, Xᵀy, yᵀy and n are all
+# blocks of it. One pass accumulates ZᵀZ per Year x Region x Category x discounted x
+# fold partition (a few hundred 5x5 matrices). Any filter combination is then fitted by
+# summing partitions, any feature subset by slicing the sum, and k-fold CV by fitting
+# on total - fold and scoring on fold, all without touching rows again.
+def row_folds(df, n_folds=N_FOLDS):
+    # CV fold of each order line from its row hash, so it is the same whichever backend,
+    # filter or row order produced df
+    return (dl.row_keys(df) % np.uint64(n_folds)).astype(np.int8)
+
+class RegressionStats:
+    @instr.traced("regression_stats_build")
+    def __init__(self, df, features=REG_FEATURES, target=REG_TARGET, n_folds=N_FOLDS):
+        self.columns = ['const'] + list(features) + [target]
+        self.n_folds = n_folds
+        self.fold = row_folds(df, n_folds)
+        Z = np.column_stack([np.ones(len(df))] + [df[c].to_numpy(dtype=float) for c in self.columns[1:]])
+        ok = np.isfinite(Z).all(axis=1)
+        grp = pd.DataFrame({k: df[k].to_numpy() for k in REG_KEYS})
+        grp['Discounted'] = df['Discount'].to_numpy() > 0
+        grp['Fold'] = self.fold
+        groups = grp[ok].groupby(list(grp.columns), sort=True)
+        codes = groups.ngroup().to_numpy()
+        self.keys = groups.size().reset_index()[list(grp.columns)]
+        p, g = Z.shape[1], len(self.keys)
+        Z = Z[ok]
+        self.gram = np.empty((g, p, p))
+        for i in range(p):
+            for j in range(i, p):
+                self.gram[:, i, j] = self.gram[:, j, i] = np.bincount(codes, weights=Z[:, i] * Z[:, j], minlength=g)
+
+    def _mask(self, year="All", region="All", category="All", discounted=None):
+        # Each filter is "All", a value or a tuple of values (multi-select)
+        m = np.ones(len(self.keys), dtype=bool)
+        sel = selection(year, region, category, "All")
+        for col in REG_KEYS:
+            value = sel[col]
+            if value == "All": continue
+            m &= (self.keys[col].isin(value) if isinstance(value, tuple) else self.keys[col] == value).to_numpy()
+        if discounted is not None: m &= (self.keys['Discounted'] == discounted).to_numpy()
+        return m
+
+    def gram_for(self, filters, discounted=None):
+        # (total ZᵀZ, per-fold ZᵀZ [n_folds, p, p]) for a (year, region, category) filter
+        m = self._mask(*filters, discounted=discounted)
+        folds = np.zeros((self.n_folds,) + self.gram.shape[1:])
+        np.add.at(folds, self.keys['Fold'].to_numpy()[m], self.gram[m])
+        return folds.sum(axis=0), folds
+
+# ---------------- Fits ----------------
+def _select(G, cols, columns):
+    idx = [0] + [columns.index(c) for c in cols]
+    return G[np.ix_(idx, idx)], G[idx, -1], G[-1, -1], G[0, 0]
+
+def _solve(A, b):
+    try: return np.linalg.solve(A, b)
+    except np.linalg.LinAlgError: return np.linalg.lstsq(A, b, rcond=None)[0]
+
+def _sse(beta, A, b, yy):
+    return yy - 2 * beta @ b + beta @ A @ beta
+
+def _r2(beta, A, b, yy, n, y_sum):
+    sst = yy - y_sum ** 2 / n
+    return 1 - _sse(beta, A, b, yy) / sst if sst > 0 else np.nan
+
+def ols_fit(G, cols, columns, folds=None):
+    # Coefficients and in-sample R² from ZᵀZ; with per-fold grams also the k-fold
+    # out-of-fold R² (mean over folds) and the coefficients of every training fit
+    A, b, yy, n = _select(G, cols, columns)
+    beta = _solve(A, b)
+    fit = {'n': int(n), 'intercept': float(beta[0]), 'coef': dict(zip(cols, beta[1:].tolist())),
+           'r2': float(_r2(beta, A, b, yy, n, b[0]))}
+    if folds is not None:
+        scores, fold_betas = [], []
+        for F in folds:
+            At, bt, yyt, nt = _select(G - F, cols, columns)
+            Af, bf, yyf, nf = _select(F, cols, columns)
+            if nf == 0 or nt <= len(cols) + 1: continue
+            bt_beta = _solve(At, bt)
+            fold_betas.append(bt_beta)
+            scores.append(_r2(bt_beta, Af, bf, yyf, nf, bf[0]))
+        fit['cv_r2'] = float(np.nanmean(scores)) if scores else np.nan
+        fit['fold_coef'] = np.array(fold_betas) if len(fold_betas) == len(folds) else None
+    return fit
+
+def simple_fit(G, x, columns):
+    # Same numbers as scipy.stats.linregress(x, target) for the rows behind G
+    A, b, yy, n = _select(G, [x], columns)
+    sxx, sxy, syy = A[1, 1] - A[0, 1] ** 2 / n, b[1] - A[0, 1] * b[0] / n, yy - b[0] ** 2 / n
+    slope = sxy / sxx
+    intercept = (b[0] - slope * A[0, 1]) / n
+    r = sxy / np.sqrt(sxx * syy) if sxx > 0 and syy > 0 else 0.0
+    df = n - 2
+    if df > 0 and abs(r) < 1:
+        from scipy import stats
+        t = r * np.sqrt(df / ((1 - r) * (1 + r)))
+        p, stderr = 2 * stats.t.sf(abs(t), df), np.sqrt((1 - r ** 2) * syy / sxx / df)
+    else:
+        p, stderr = 0.0, 0.0
+    return {'n': int(n), 'slope': float(slope), 'intercept': float(intercept), 'r': float(r),
+            'p_value': float(p), 'stderr': float(stderr)}
+
+# ---------------- Cached Access ----------------
+@st.cache_resource(max_entries=2) # Built once per dataset version and shared across sessions
+def _load_regression_stats(path, version):
+    instr.cache_miss()
+    return RegressionStats(get_backend(path).rows(ALL_ROWS, path, REG_COLUMNS))
+
+@instr.traced(cached=True)
+def load_regression_stats(path=DATA_PATH):
+    return _load_regression_stats(path, dataset_version(path))
+
+@st.cache_data(max_entries=1024)
+def _cached_linregress(filters, x, path, version):
+    instr.cache_miss()
+    rs = _load_regression_stats(path, version)
+    return simple_fit(rs.gram_for(filters, discounted=True if x == 'Discount' else None)[0], x, rs.columns)
+
+def _key(filters):
+    # (year, region, category) normalised like plot_functions.filter_key; the statistics
+    # are partitioned by year, so a date range cannot be applied here
+    return tuple(selection(*filters[:3], "All").values())[:3]
+
+@instr.traced(cached=True)
+def linregress(filters, x='Discount', path=DATA_PATH):
+    # Simple regression of the target on x for (year, region, category); for Discount
+    # only discounted lines are used, as on the regression page
+    return _cached_linregress(_key(filters), x, path, dataset_version(path))
+
+@st.cache_data(max_entries=1024)
+def _cached_multiple(filters, features, path, version):
+    instr.cache_miss()
+    rs = _load_regression_stats(path, version)
+    G, folds = rs.gram_for(filters)
+    return ols_fit(G, list(features), rs.columns, folds)
+
+@instr.traced(cached=True)
+def multiple_regression(filters, features=REG_FEATURES, path=DATA_PATH):
+    return _cached_multiple(_key(filters), tuple(features), path, dataset_version(path))
+
+def predict(fit, df, fold=None):
+    # Predictions for df's rows; with the fold of each row, out-of-fold predictions
+    X = np.column_stack([np.ones(len(df))] + [df[c].to_numpy(dtype=float) for c in fit['coef']])
+    if fold is None or fit.get('fold_coef') is None:
+        return X @ np.array([fit['intercept']] + list(fit['coef'].values()))
+    return np.einsum('ij,ij->i', X, fit['fold_coef'][fold])
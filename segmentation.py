@@ -0,0 +1,63 @@
+import streamlit as st
+import pandas as pd
+from data_loader import dataset_version, DATA_PATH
+from customer_metrics import load_customer_metrics
+import instrumentation as instr
+
+FEATURES = ['Sales', 'Profit', 'Total Orders']
+K_RANGE = range(2, 9)
+# Above this many customers the sweep uses MiniBatchKMeans and a sampled silhouette
+MINIBATCH_THRESHOLD = 50_000
+SILHOUETTE_SAMPLE = 10_000
+
+# ---------------- K-Means Sweep ----------------
+# Centres from the previous dataset version, per (mode, K). A refit after new data is
+# ingested starts from them (one init) instead of n_init fresh k-means++ runs.
+_warm_centers = {}
+
+# scikit-learn and joblib are imported where they are used, so importing this module
+# (or a page that only reads the cached Segmentation) does not pay for them
+def _make_model(k, mode, centers=None):
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    init, warm = ('k-means++', False) if centers is None else (centers, True)
+    if mode == 'minibatch':
+        return MiniBatchKMeans(n_clusters=k, init=init, n_init=1 if warm else 3, batch_size=4096, random_state=42)
+    return KMeans(n_clusters=k, init=init, n_init=1 if warm else 10, random_state=42)
+
+def _fit_one(k, mode, X):
+    from sklearn.metrics import silhouette_score
+    model = _make_model(k, mode, _warm_centers.get((mode, k))).fit(X)
+    sample = min(len(X), SILHOUETTE_SAMPLE)
+    score = silhouette_score(X, model.labels_, sample_size=sample, random_state=42)
+    return k, model, score
+
+class Segmentation:
+    # Feature matrix, scaler and one fitted model per K in K_RANGE, fitted in parallel.
+    # customers: one row per Customer ID with the FEATURES columns (customer_metrics).
+    @instr.traced("kmeans_sweep")
+    def __init__(self, customers, mode='auto', n_jobs=-1):
+        from joblib import Parallel, delayed
+        from sklearn.preprocessing import StandardScaler
+        self.features = customers
+        self.mode = mode if mode != 'auto' else ('minibatch' if len(self.features) > MINIBATCH_THRESHOLD else 'full')
+        self.scaler = StandardScaler()
+        self.models, sweep = {}, []
+        if len(self.features) < 10:
+            self.sweep = pd.DataFrame(columns=['K', 'Inertia', 'Silhouette'])
+            return
+        X = self.scaler.fit_transform(self.features[FEATURES])
+        results = Parallel(n_jobs=n_jobs, prefer="threads")(delayed(_fit_one)(k, self.mode, X) for k in K_RANGE)
+        for k, model, score in results:
+            self.models[k] = model
+            _warm_centers[(self.mode, k)] = model.cluster_centers_
+            sweep.append({'K': k, 'Inertia': model.inertia_, 'Silhouette': score})
+        self.sweep = pd.DataFrame(sweep)
+
+@st.cache_resource(max_entries=4) # Fitted once per dataset version, shared by every session
+def _load_segmentation(mode, path, version):
+    instr.cache_miss()
+    return Segmentation(load_customer_metrics(path).table, mode)
+
+@instr.traced(cached=True)
+def load_segmentation(mode='auto', path=DATA_PATH):
+    return _load_segmentation(mode, path, dataset_version(path))
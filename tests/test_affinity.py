@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+import data_loader as dl
+import affinity as af
+
+# Five baskets with supports that are easy to check by hand
+BASKETS = {'A': ['Binders', 'Paper'], 'B': ['Binders', 'Paper', 'Phones'], 'C': ['Binders', 'Phones'],
+           'D': ['Paper'], 'E': ['Binders', 'Paper', 'Chairs']}
+
+def _lines(baskets):
+    return pd.DataFrame([(order, item) for order, items in baskets.items() for item in items],
+                        columns=['Order ID', 'Sub-Category'])
+
+def _mine(df, min_support):
+    bits, items, n_baskets = af.basket_bitsets(df)
+    return af.frequent_itemsets(bits, items, n_baskets, min_support), n_baskets
+
+def _by_set(frame):
+    return dict(zip(frame['itemsets'], frame['support']))
+
+def _rule(rules, antecedent, consequent):
+    hit = (rules['antecedents'] == frozenset(antecedent)) & (rules['consequents'] == frozenset(consequent))
+    assert hit.sum() == 1
+    return rules[hit].iloc[0]
+
+def test_known_supports_and_lifts():
+    itemsets, n = _mine(_lines(BASKETS), 0.4)
+    assert n == 5
+    assert _by_set(itemsets) == pytest.approx({
+        frozenset({'Binders'}): 0.8, frozenset({'Paper'}): 0.8, frozenset({'Phones'}): 0.4,
+        frozenset({'Binders', 'Paper'}): 0.6, frozenset({'Binders', 'Phones'}): 0.4})
+    rules = af.association_rules(itemsets, metric='lift', min_threshold=0)
+    rule = _rule(rules, {'Phones'}, {'Binders'})
+    # supp(Phones, Binders) / supp(Phones) = 1.0 and lift = 1.0 / supp(Binders)
+    assert rule['confidence'] == pytest.approx(1.0)
+    assert rule['lift'] == pytest.approx(1.25)
+    assert rule['leverage'] == pytest.approx(0.4 - 0.4 * 0.8)
+    assert rule['conviction'] == np.inf
+    rule = _rule(rules, {'Paper'}, {'Binders'})
+    assert rule['lift'] == pytest.approx(0.75 / 0.8)
+    assert rule['conviction'] == pytest.approx((1 - 0.8) / (1 - 0.75))
+
+def test_max_len_and_empty_input():
+    itemsets, _ = _mine(_lines(BASKETS), 0.2)
+    bits, items, n = af.basket_bitsets(_lines(BASKETS))
+    assert af.frequent_itemsets(bits, items, n, 0.2, max_len=1)['itemsets'].map(len).max() == 1
+    assert itemsets['itemsets'].map(len).max() == 3
+    empty, n = _mine(_lines({}), 0.1)
+    assert n == 0 and empty.empty
+
+def test_matches_mlxtend_apriori():
+    mlx = pytest.importorskip("mlxtend.frequent_patterns")
+    df = dl.prepare_data(dl.make_mock_data(20_000, 5))
+    itemsets, n = _mine(df, 0.01)
+    onehot = pd.crosstab(df['Order ID'], df['Sub-Category']).astype(bool)
+    ref = mlx.apriori(onehot, min_support=0.01, use_colnames=True)
+    assert len(itemsets) == len(ref)
+    assert _by_set(itemsets) == pytest.approx(_by_set(ref))
+    rules = af.association_rules(itemsets, metric='lift', min_threshold=1)
+    ref_rules = mlx.association_rules(ref, num_itemsets=n, metric='lift', min_threshold=1)
+    key = ['antecedents', 'consequents']
+    got, want = rules.set_index(key).sort_index(), ref_rules.set_index(key)[rules.columns[2:]].sort_index()
+    assert got.index.equals(want.index)
+    np.testing.assert_allclose(got.to_numpy(float), want.to_numpy(float), rtol=1e-9)
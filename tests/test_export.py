@@ -0,0 +1,63 @@
+import io
+import gzip
+import pandas as pd
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+import export as ex
+
+def _frame(n=250):
+    return pd.DataFrame({'Order ID': [f"CA-{i:05d}" for i in range(n)],
+                         'Region': pd.Categorical(['West', 'East'] * (n // 2)),
+                         'Order Date': pd.date_range('2016-01-01', periods=n, freq='D'),
+                         'Sales': [i * 1.5 for i in range(n)]})
+
+def _deferred(monkeypatch, df, fmt):
+    # The data callable export_panel hands to st.download_button for `fmt`
+    calls = {}
+    monkeypatch.setattr(ex.st, 'radio', lambda *a, **k: fmt)
+    monkeypatch.setattr(ex.st, 'download_button', lambda **k: calls.update(k))
+    ex.export_panel(df, "orders", "test", ("test", fmt, len(df)))
+    return calls['data']
+
+def _read(fmt, data):
+    if fmt == 'csv': return pd.read_csv(io.BytesIO(data))
+    if fmt == 'csv.gz': return pd.read_csv(io.BytesIO(gzip.decompress(data)))
+    return pd.read_parquet(io.BytesIO(data))
+
+@pytest.mark.parametrize("fmt", list(ex.FORMATS))
+def test_deferred_download_is_accepted_by_streamlit(monkeypatch, fmt):
+    df = _frame()
+    data = _deferred(monkeypatch, df, fmt)
+    assert callable(data)
+    # Same conversion MediaFileManager.execute_deferred applies to the callable's result
+    payload, _ = convert_data_to_bytes_and_infer_mime(data(), unsupported_error=TypeError(fmt))
+    back = _read(fmt, payload)
+    assert list(back.columns) == list(df.columns)
+    assert len(back) == len(df)
+    assert back['Sales'].tolist() == df['Sales'].tolist()
+
+@pytest.mark.parametrize("fmt", list(ex.FORMATS))
+def test_build_export_chunks_match_single_pass(fmt):
+    df = _frame(1000)
+    one = ex.build_export(df, fmt).getvalue()
+    chunked = ex.build_export(df, fmt, chunk_rows=100).getvalue()
+    assert _read(fmt, one).equals(_read(fmt, chunked))
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        ex.build_export(_frame(), 'xlsx')
+
+def test_loaded_on_click_with_estimate_from_sample(monkeypatch):
+    df = _frame(20000)
+    loads = []
+    calls = {}
+    monkeypatch.setattr(ex.st, 'radio', lambda *a, **k: 'csv')
+    monkeypatch.setattr(ex.st, 'download_button', lambda **k: calls.update(k))
+    ex.export_panel(df.iloc[:ex.SAMPLE_ROWS], "orders", "test", ("test", "loaded"),
+                    load=lambda: loads.append(1) or df, n_rows=len(df))
+    assert not loads and calls['label'].startswith(f"Download {len(df):,} rows")
+    payload = calls['data']().getvalue()
+    assert loads == [1]
+    assert len(_read('csv', payload)) == len(df)
+    est = ex.estimate_sizes(df.iloc[:ex.SAMPLE_ROWS], ['csv'], n_rows=len(df))['csv']
+    assert abs(est - len(payload)) / len(payload) < 0.05
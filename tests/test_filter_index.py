@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+import data_loader as dl
+import plot_functions as pf
+
+# (year, region, category, segment, dates) in the forms the page widgets produce
+FILTERS = [
+    ("All", "All", "All", "All", None),
+    (2016, "West", "All", "All", None),
+    ([2015, 2017], ["East", "South"], "All", ["Consumer", "Corporate"], None),
+    ([], [], [], [], ()),
+    ("All", "All", "Technology", "All", ("2016-03-01", "2016-06-30")),
+    ([2016, 2017], "Central", "All", "All", ("2017-12-31", "2016-11-15")),
+    ("All", "All", "All", "All", ("2015-02-01", "2015-02-01")),
+    ("All", "All", "All", "All", ("2016-05-01",)),
+    (2016, "All", "All", "All", ("2017-01-01", "2017-12-31")),
+    ("All", "North", "All", "All", None),
+]
+
+@pytest.fixture(scope="module")
+def orders():
+    return dl.prepare_data(dl.make_mock_data(10_000, 9))
+
+@pytest.fixture(scope="module")
+def index(orders):
+    return dl.FilterIndex(orders)
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_index_matches_mask(orders, index, filters):
+    fast = pf.apply_filters(orders, *filters, index=index)
+    slow = pf.apply_filters(orders, *filters)
+    pd.testing.assert_frame_equal(fast, slow)
+
+def test_date_range_is_inclusive(orders, index):
+    day = orders['Order Date'].iloc[0].normalize()
+    got = pf.apply_filters(orders, "All", "All", "All", "All", (day, day), index=index)
+    assert len(got) and (got['Order Date'].dt.normalize() == day).all()
+    assert len(got) == (orders['Order Date'].dt.normalize() == day).sum()
+
+def test_index_rows_are_ascending(orders, index):
+    rows = index.rows(pf.selection([2015, 2016], ["West", "East"], "All", "All", ("2015-06-01", "2016-06-30")))
+    assert len(rows) and (rows[1:] > rows[:-1]).all()
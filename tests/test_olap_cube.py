@@ -0,0 +1,43 @@
+import itertools
+import pandas as pd
+import pytest
+import data_loader as dl
+from olap_cube import OlapCube, OLAP_DIMS, OLAP_VALUES, OLAP_AGGS
+
+FILTERS = [("All", "All"), ([2016], "All"), ([2015, 2017], ["East", "West"])]
+
+@pytest.fixture(scope="module")
+def orders():
+    return dl.prepare_data(dl.make_mock_data(6_000, 11))
+
+@pytest.fixture(scope="module")
+def cube(orders):
+    return OlapCube(orders)
+
+def _reference(df, year, region, index, columns, value, agg):
+    # What pages/03_OLAP.py computed before the cube: pivot_table over the filtered lines
+    if year != "All": df = df[df['Order Year'].isin(year)]
+    if region != "All": df = df[df['Region'].isin(region)]
+    ref = pd.pivot_table(df, index=index, columns=columns, values=value, aggfunc=agg, fill_value=0, observed=True)
+    ref.index, ref.columns = ref.index.astype(object), ref.columns.astype(object)
+    return ref
+
+@pytest.mark.parametrize("agg", OLAP_AGGS)
+@pytest.mark.parametrize("year,region", FILTERS)
+def test_pivot_matches_pivot_table(orders, cube, agg, year, region):
+    for (index, columns), value in itertools.product(itertools.permutations(OLAP_DIMS, 2), OLAP_VALUES):
+        got = cube.pivot(year, region, index, columns, value, agg)
+        ref = _reference(orders, year, region, index, columns, value, agg)
+        pd.testing.assert_frame_equal(got, ref, check_dtype=False, check_names=False, rtol=1e-9, atol=1e-9)
+
+def test_merged_batches_match_single_build(orders, cube):
+    half = len(orders) // 2
+    merged = OlapCube(orders.iloc[:half]).merge(OlapCube(orders.iloc[half:]))
+    assert merged.rows == cube.rows
+    for agg in OLAP_AGGS:
+        pd.testing.assert_frame_equal(merged.pivot("All", "All", 'Category', 'Region', 'Profit', agg),
+                                      cube.pivot("All", "All", 'Category', 'Region', 'Profit', agg), rtol=1e-9)
+
+def test_unknown_aggregation(cube):
+    with pytest.raises(ValueError):
+        cube.pivot("All", "All", 'Category', 'Region', 'Sales', 'median')
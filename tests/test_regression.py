@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import data_loader as dl
+import regression as rg
+
+FILTERS = [("All", "All", "All"), (2016, "West", "All"), ((2015, 2017), ("East", "South"), "Technology")]
+
+@pytest.fixture(scope="module")
+def orders():
+    return dl.prepare_data(dl.make_mock_data(8_000, 21))
+
+@pytest.fixture(scope="module")
+def stats(orders):
+    return rg.RegressionStats(orders[rg.REG_COLUMNS])
+
+def _rows(df, filters):
+    year, region, category = (v if isinstance(v, tuple) else (v,) for v in filters)
+    for col, values in zip(rg.REG_KEYS, (year, region, category)):
+        if values != ("All",): df = df[df[col].isin(values)]
+    return df
+
+def _design(df, features):
+    return np.column_stack([np.ones(len(df))] + [df[c].to_numpy(float) for c in features])
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_simple_fit_matches_polyfit_and_linregress(orders, stats, filters):
+    from scipy import stats as sps
+    d = _rows(orders, filters)
+    d = d[d['Discount'] > 0]
+    fit = rg.simple_fit(stats.gram_for(filters, discounted=True)[0], 'Discount', stats.columns)
+    slope, intercept = np.polyfit(d['Discount'].to_numpy(float), d['Profit'].to_numpy(float), 1)
+    ref = sps.linregress(d['Discount'].to_numpy(float), d['Profit'].to_numpy(float))
+    assert fit['n'] == len(d)
+    assert fit['slope'] == pytest.approx(slope, rel=1e-8)
+    assert fit['intercept'] == pytest.approx(intercept, rel=1e-8, abs=1e-8)
+    assert fit['r'] == pytest.approx(ref.rvalue, rel=1e-8)
+    assert fit['p_value'] == pytest.approx(ref.pvalue, rel=1e-6, abs=1e-300)
+    assert fit['stderr'] == pytest.approx(ref.stderr, rel=1e-8)
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_ols_fit_matches_lstsq(orders, stats, filters):
+    d = _rows(orders, filters)
+    X, y = _design(d, rg.REG_FEATURES), d[rg.REG_TARGET].to_numpy(float)
+    beta = np.linalg.lstsq(X, y, rcond=None)[0]
+    G, folds = stats.gram_for(filters)
+    fit = rg.ols_fit(G, rg.REG_FEATURES, stats.columns, folds)
+    assert fit['n'] == len(d)
+    np.testing.assert_allclose([fit['intercept']] + list(fit['coef'].values()), beta, rtol=1e-7, atol=1e-9)
+    resid = y - X @ beta
+    assert fit['r2'] == pytest.approx(1 - resid @ resid / ((y - y.mean()) @ (y - y.mean())), rel=1e-8)
+
+def test_cross_validation_matches_refits(orders, stats):
+    # Out-of-fold R² and predictions equal refitting with lstsq on the other folds
+    G, folds = stats.gram_for(FILTERS[0])
+    fit = rg.ols_fit(G, rg.REG_FEATURES, stats.columns, folds)
+    X, y = _design(orders, rg.REG_FEATURES), orders[rg.REG_TARGET].to_numpy(float)
+    fold = rg.row_folds(orders)
+    scores, pred = [], np.empty(len(y))
+    for k in range(rg.N_FOLDS):
+        test = fold == k
+        beta = np.linalg.lstsq(X[~test], y[~test], rcond=None)[0]
+        pred[test] = X[test] @ beta
+        resid, dev = y[test] - pred[test], y[test] - y[test].mean()
+        scores.append(1 - resid @ resid / (dev @ dev))
+    assert fit['cv_r2'] == pytest.approx(np.mean(scores), rel=1e-7)
+    np.testing.assert_allclose(rg.predict(fit, orders, fold), pred, rtol=1e-7, atol=1e-7)
+
+def test_folds_ignore_row_order_and_projection(orders):
+    shuffled = orders.sample(frac=1, random_state=0)
+    expected = rg.row_folds(orders)[orders.index.get_indexer(shuffled.index)]
+    assert (rg.row_folds(shuffled[['Row ID', 'Order ID']]) == expected).all()
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import data_loader as dl
+from backends import get_backend, BACKEND
+import plot_functions as pf
+import regression as rg
+from olap_cube import load_olap_cube
+from affinity import load_rules
+from segmentation import load_segmentation
+
+# ---------------- Cache Warm-up ----------------
+# Precomputes what every page needs for its default filters ("All" everywhere), so
+# the first visitor after a deploy or a dataset refresh hits warm caches:
+#   * at server start: start_background() (called by each page) runs warm() once per
+#     process and dataset version on a daemon thread; disable with SUPERSTORE_WARMUP=0
+#   * from the command line: python warmup.py builds the on-disk state (snapshot,
+#     persisted cube) ahead of a deploy and reports per-page timings
+# The st.cache_* stores are per process, so page work runs on a thread pool in the
+# process that serves the pages.
+WARMUP = os.environ.get("SUPERSTORE_WARMUP", "1") not in ("", "0")
+DEFAULT_FILTERS = ("All", "All", "All", "All")
+logger = logging.getLogger("superstore.warmup")
+
+def page_tasks():
+    flt = pf.filter_key(*DEFAULT_FILTERS)
+    return {
+        'overview': lambda: ([pf.filter_choices(c) for c in ('Order Year', 'Region', 'Category', 'Segment')],
+                             pf.compute_kpis(filters=flt), pf.fig_yearly_overview(filters=flt),
+                             pf.fig_monthly_sales(filters=flt), pf.fig_sales_by_region(filters=flt)),
+        'dashboard': lambda: (pf.fig_profit_by_category(filters=flt), pf.fig_sales_by_state(filters=flt),
+                              pf.fig_geo_drilldown(flt)),
+        'advanced': lambda: pf.fig_top_customers(filters=flt),
+        'olap': load_olap_cube,
+        'forecasting': lambda: pf.fig_forecast(filters=flt),
+        'regression': lambda: (rg.linregress(flt[:3]), rg.multiple_regression(flt[:3])),
+        'affinity': lambda: load_rules(flt),
+        'segmentation': load_segmentation,
+    }
+
+def _timed(fn):
+    start = time.perf_counter()
+    try:
+        fn()
+        return round(time.perf_counter() - start, 3), None
+    except Exception as e:
+        logger.warning("warm-up task failed: %s", e)
+        return round(time.perf_counter() - start, 3), f"{type(e).__name__}: {e}"
+
+def warm(max_workers=4):
+    # {step: (seconds, error or None)}; the shared dataset and index load first, or with
+    # DuckDB the engine (which builds the snapshot if needed) instead of the in-memory frame
+    if BACKEND == "duckdb": report = {'backend': _timed(get_backend)}
+    else: report = {'load_data': _timed(dl.load_data), 'filter_index': _timed(dl.load_filter_index)}
+    tasks = page_tasks()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup") as pool:
+        futures = {name: pool.submit(_timed, fn) for name, fn in tasks.items()}
+        report.update({name: f.result() for name, f in futures.items()})
+    return report
+
+@st.cache_resource(max_entries=2) # Once per process and dataset version
+def _background(version):
+    thread = threading.Thread(target=warm, name="superstore-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def start_background():
+    if WARMUP: _background(dl.dataset_version())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the default-filter results for every page.")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    report = warm(args.workers)
+    for name, (secs, error) in report.items():
+        print(f"{name:<14} {secs:8.3f}s" + (f"  {error}" if error else ""))
+    sys.exit(1 if any(error for _, error in report.values()) else 0)